@@ -10,9 +10,11 @@ config = {
     'download_url': 'project download url',
     'author_email': 'vince.r.cooley@gmail.com',
     'version': '0.1',
-    'install_requires': ['nose'],
+    'install_requires': [],
+    'tests_require': ['nose'],
+    'extras_require': {'results': ['numpy'], 'features': ['numpy'], 'selfplay': ['numpy'], 'inference': ['numpy']},
     'packages': ['train'],
-    'scripts': ['train'],
+    'entry_points': {'console_scripts': ['train = train.train:main']},
     'name': 'Mexican Train Game'
 }
 
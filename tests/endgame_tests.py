@@ -0,0 +1,108 @@
+from nose.tools import *
+from train.train import AI, Board, Engine
+from train.endgame import *
+
+
+def brute_force(solver, state, root):
+    best = None
+    for move in solver.moves(state):
+        following, value = solver.apply(state, move, root)
+        if following is not None:
+            value = brute_force(solver, following, root)
+        if best is None or (value > best if state[PLAYER] == root else value < best):
+            best = value
+    return best
+
+
+def endgame_board():
+    board = Board(2, 6)
+    board.board = [[(0, 'open'), (6, 6), (6, 2)],
+                   [(1, 'closed'), (6, 6), (6, 4)],
+                   [('mex', 'open'), (6, 6), (6, 1)]
+                   ]
+    board.hands = [[(2, 5), (2, 2), (0, 3)], [(4, 3), (1, 5)]]
+    board.boneyard = []
+    return board
+
+
+def double_first_test():
+    board = endgame_board()
+    solver = EndgameSolver(6)
+    state = solver.position(board, 0, True)
+    assert_equal(solver.moves(state), [(solver.tables.ids[(2, 2)], 0), (solver.tables.ids[(2, 5)], 0)])
+    move, value, solved = solver.best_move(state)
+    assert solved
+    assert_equal(move, (solver.tables.ids[(2, 2)], 0))
+    assert_equal(value, brute_force(solver, state, 0))
+
+
+def blocked_round_test():
+    board = endgame_board()
+    board.hands = [[(0, 0)], [(0, 3)]]
+    solver = EndgameSolver(6)
+    state = solver.position(board, 0, True, idle_turns=1)
+    assert_equal(solver.moves(state), [END])
+    following, value = solver.apply(state, END, 0)
+    assert following is None
+    assert_equal(value, WIN)
+    assert_equal(solver.apply(state, END, 1)[1], -3)
+
+
+def first_turn_train_test():
+    board = endgame_board()
+    board.board[0] = [(0, 'closed'), (6, 6)]
+    board.hands[0] = [(6, 5), (5, 5), (0, 3)]
+    solver = EndgameSolver(6)
+    state = solver.position(board, 0, False)
+    assert_equal(solver.moves(state), [(solver.tables.ids[(5, 6)], 0)])
+    following = solver.apply(state, (solver.tables.ids[(5, 6)], 0), 0)[0]
+    assert_equal(following[PLAYER], 0)
+    assert_equal(solver.moves(following), [(solver.tables.ids[(5, 5)], 0), END])
+    assert_equal(solver.apply(following, END, 0)[0][STARTED], (True, True))
+
+
+def matches_brute_force_test():
+    checked = 0
+    for seed in range(40):
+        engine = Engine(0, 2, 6, seed)
+        engine.seat_players([AI, AI])
+        engine.start_game()
+        while engine.round_winner() is False and engine.board.boneyard:
+            engine.play_turn()
+        if engine.round_winner() is not False:
+            continue
+        player = engine.players[engine.board.current_player]
+        if player.own_train_started:
+            engine.board.board[player.player_num][0] = player.open_header
+        solver = EndgameSolver(6, node_limit=10 ** 6)
+        state = solver.position(engine.board, player.player_num, player.own_train_started, idle_turns=engine.idle_turns)
+        move, value, solved = solver.best_move(state)
+        if value is not None:
+            assert solved
+            assert_equal(value, brute_force(solver, state, player.player_num))
+            checked += 1
+    assert checked > 0
+
+
+def endgame_ai_test():
+    class SmallBudgetAI(EndgameAI):
+        node_limit = 200
+    for seed in range(10):
+        engine = Engine(0, 2, 9, seed)
+        engine.seat_players([SmallBudgetAI, EndgameAI])
+        assert engine.run_game() in range(2)
+
+
+def hidden_hands_test():
+    # With three players the split of the unseen dominoes is hidden, so EndgameAI must not search the real hands.
+    for seed in range(10):
+        results = []
+        for player_types in ([EndgameAI, AI, EndgameAI], [AI, AI, AI]):
+            engine = Engine(0, 3, 9, seed)
+            engine.seat_players(player_types)
+            results.append((engine.run_game(), engine.scores))
+        assert_equal(results[0], results[1])
+    board = endgame_board()
+    assert_equal(EndgameAI(board, 0).endgame_hands(), board.hands)
+    board.boneyard = [(0, 0)]
+    assert_equal(EndgameAI(board, 0).endgame_hands(), None)
@@ -0,0 +1,87 @@
+import random
+
+from nose.tools import *
+from train.train import AI
+from train.evaluation import *
+
+
+class LowestFirstAI(AI):
+    def rank_move(self, move):
+        domino = self.hand[move[0]]
+        return -(domino[0] + domino[1])
+
+
+class NoisyAI(AI):
+    def rank_move(self, move):
+        return self.board.random.random()
+
+
+class NullComparison(Comparison):
+    """
+    Comparison whose trials are drawn from a distribution with a mean of zero instead of played.
+    """
+
+    def __init__(self, random_state, **kwargs):
+        Comparison.__init__(self, AI, AI, **kwargs)
+        self.random_state = random_state
+
+    def run_trial(self):
+        self.win_share.push(self.random_state.choice([-0.5, 0.0, 0.0, 0.5]))
+        self.pip_advantage.push(self.random_state.gauss(0, 25))
+
+
+def running_stat_test():
+    stat = RunningStat()
+    for value in [2, 4, 4, 4, 5, 5, 7, 9]:
+        stat.push(value)
+    assert_equal(stat.count, 8)
+    assert_almost_equal(stat.mean, 5.0)
+    assert_almost_equal(stat.variance(), 32.0 / 7)
+    low, high = stat.interval(1.96)
+    assert_almost_equal((low + high) / 2, 5.0)
+    sequence_low, sequence_high = stat.sequence_interval(0.05)
+    assert_almost_equal((sequence_low + sequence_high) / 2, 5.0)
+    assert sequence_low < low and sequence_high > high
+
+
+def play_match_test():
+    assert_equal(play_match([AI, LowestFirstAI], 7), play_match([AI, LowestFirstAI], 7))
+
+
+def identical_strategies_test():
+    comparison = Comparison(AI, AI, max_trials=10).run()
+    summary = comparison.summary()
+    assert_equal(summary['trials'], 10)
+    assert_equal(summary['games'], 20)
+    assert_equal(summary['win_rate'], 0.5)
+    assert not summary['significant']
+
+
+def equal_noisy_strategies_test():
+    for first_seed in (0, 1000, 2000):
+        summary = Comparison(NoisyAI, NoisyAI, max_trials=100, first_seed=first_seed).run().summary()
+        assert_equal(summary['trials'], 100)
+        assert not summary['significant']
+
+
+def false_positive_rate_test():
+    # Checking a fixed 1% interval after every trial would stop on about one run in eight.
+    random_state = random.Random(0)
+    for measure in Comparison.measures:
+        stopped = 0
+        for run in range(200):
+            comparison = NullComparison(random_state, measure=measure, max_trials=500).run()
+            stopped += comparison.significant()
+        assert stopped <= 6
+
+
+def early_stop_test():
+    comparison = Comparison(AI, LowestFirstAI, max_trials=500).run()
+    summary = comparison.summary()
+    assert summary['significant']
+    assert summary['trials'] < 500
+    assert summary['win_rate_interval'][0] > 0.5
+
+
+def bad_measure_test():
+    assert_raises(ValueError, Comparison, AI, AI, measure='speed')
@@ -0,0 +1,61 @@
+from nose.tools import *
+from train.train import Board
+from train.features import *
+
+
+def setup_func():
+    global board
+    board = Board(2, 6)
+    board.board = [[(0, 'closed'), (6, 6), (6, 3)],
+                   [(1, 'open'), (6, 6), (6, 6)],
+                   [('mex', 'open'), (6, 6), (6, 3)]
+                   ]
+    board.hands = [[(3, 3), (1, 3), (0, 5)], [(2, 4)]]
+    board.boneyard = [(0, 0), (1, 1), (2, 2)]
+    board.last_played = ((6, 6), 1)
+
+
+@with_setup(setup_func)
+def extract_test():
+    extractor = FeatureExtractor(2, 6)
+    assert_equal(extractor.size, 7 + 7 + 3 + 3)
+    assert_equal(len(extractor.names()), extractor.size)
+    features = dict(zip(extractor.names(), extractor.extract(board, 0, extractor.allocate(1)[0])))
+    assert_equal([features['hand_%d' % value] for value in range(7)], [1, 1, 0, 3, 0, 1, 0])
+    assert_equal([features['ends_%d' % value] for value in range(7)], [0, 0, 0, 2, 0, 0, 1])
+    assert_equal([features['train_0'], features['train_1'], features['train_mex']], [1, 1, 1])
+    assert_equal(features['double_pending'], 1)
+    assert_equal(features['hand_size'], 3)
+    assert_equal(features['boneyard'], 3)
+
+
+@with_setup(setup_func)
+def closed_train_test():
+    extractor = FeatureExtractor(2, 6)
+    board.last_played = ((6, 3), 0)
+    features = dict(zip(extractor.names(), extractor.extract(board, 1, numpy.ones(extractor.size))))
+    assert_equal([features['train_0'], features['train_1'], features['train_mex']], [0, 1, 1])
+    assert_equal(features['ends_3'], 1)
+    assert_equal(features['double_pending'], 0)
+    assert_equal(features['hand_2'], 1)
+    assert_equal(features['hand_3'], 0)
+
+
+@with_setup(setup_func)
+def extract_batch_test():
+    extractor = FeatureExtractor(2, 6)
+    out = extractor.allocate(4)
+    result = extractor.extract_batch([(board, 0), (board, 1)], out)
+    assert result is out
+    assert_equal(out[0].tolist(), extractor.extract(board, 0, numpy.empty(extractor.size)).tolist())
+    assert_equal(out[1].tolist(), extractor.extract(board, 1, numpy.empty(extractor.size)).tolist())
+    assert_equal(extractor.extract_batch([(board, 0)]).shape, (1, extractor.size))
+    assert_raises(ValueError, extractor.extract_batch, [(board, 0)] * 5, out)
+
+
+@with_setup(setup_func)
+def mismatched_board_test():
+    out = FeatureExtractor(2, 6).allocate(2)
+    assert_raises(ValueError, FeatureExtractor(2, 9).extract, board, 0, out[0])
+    assert_raises(ValueError, FeatureExtractor(3, 6).extract, board, 0, out[0])
+    assert_raises(ValueError, FeatureExtractor(2, 6).extract_batch, [(board, 0), (Board(4, 6), 0)], out)
@@ -0,0 +1,133 @@
+from nose.tools import *
+from train.train import AI, Board, Engine
+from train.endgame import EndgameSolver
+from train.inference import *
+
+
+def setup_func():
+    global board, tracker
+    board = Board(3, 6)
+    board.board = [[(0, 'closed'), (6, 6), (6, 2)],
+                   [(1, 'open'), (6, 6), (6, 4)],
+                   [(2, 'closed'), (6, 6)],
+                   [('mex', 'open'), (6, 6), (6, 1)]
+                   ]
+    board.hands = [[(0, 0), (2, 3)], [(0, 1), (3, 5), (5, 5)], [(1, 2), (0, 5), (3, 3)]]
+    board.boneyard = [(0, 2), (0, 3), (0, 4), (1, 1), (1, 3), (1, 4), (1, 5), (2, 2), (2, 4), (2, 5), (3, 4),
+                      (4, 4), (4, 5), (0, 6), (3, 6), (5, 6)]
+    board.last_played = ((6, 1), 3)
+    tracker = BeliefTracker(board, 0)
+
+
+def assert_balanced(tracker):
+    table = tracker.probabilities
+    unseen = tracker.unseen()
+    assert_almost_equal(table[:, unseen].sum(axis=0).min(), 1.0)
+    assert_almost_equal(table[:, unseen].sum(axis=0).max(), 1.0)
+    assert_equal(table[:, ~unseen].sum(), 0)
+    assert_equal(table[0].sum(), 0)
+
+
+@with_setup(setup_func)
+def reset_test():
+    assert_balanced(tracker)
+    assert_equal(tracker.probability(1, (0, 0)), 0)
+    assert_equal(tracker.probability(2, (6, 2)), 0)
+    assert_almost_equal(tracker.probability(1, (3, 4)), 3.0 / 22)
+    assert_almost_equal(tracker.probabilities[board.num_players].sum(), 16)
+
+
+@with_setup(setup_func)
+def opponent_draw_test():
+    tracker('turn_start', 1)
+    before = tracker.probabilities.copy()
+    board.hands[1].append(board.boneyard.pop())
+    tracker('draw', 1, board.hands[1][-1])
+    # Player 1 could play on their own train (pip 4) and the Mexican train (pip 1), so they only hold one of those if
+    # it is the domino they drew.
+    for domino in [(1, 1), (4, 4), (0, 4), (1, 3), (3, 4)]:
+        assert tracker.probability(1, domino) < before[1, tracker.ids[domino]]
+    assert_almost_equal(tracker.probabilities[1].sum(), 4, places=2)
+    assert tracker.probability(1, (2, 2)) > before[1, tracker.ids[(2, 2)]]
+    assert_balanced(tracker)
+
+
+@with_setup(setup_func)
+def pass_test():
+    tracker('turn_start', 2)
+    tracker('turn_end', 2)
+    # Player 2 has not started, so only their own train (pip 6) was open to them.
+    assert_equal(tracker.probability(2, (0, 6)), 0)
+    assert_equal(tracker.probability(2, (3, 6)), 0)
+    assert tracker.probability(2, (0, 4)) > 0
+    assert_balanced(tracker)
+
+
+@with_setup(setup_func)
+def play_test():
+    tracker('turn_start', 1)
+    board.hands[1].remove((5, 5))
+    tracker('play', 1, (5, 5), 3)
+    assert_equal(tracker.probabilities[:, tracker.ids[(5, 5)]].sum(), 0)
+    assert_almost_equal(tracker.probabilities[1].sum(), 2, places=1)
+    tracker('turn_end', 1)
+    assert tracker.probability(1, (1, 1)) > 0
+
+
+@with_setup(setup_func)
+def own_draw_test():
+    board.hands[0].append(board.boneyard.pop())
+    tracker('draw', 0, (5, 6))
+    assert_equal(tracker.probabilities[:, tracker.ids[(5, 6)]].sum(), 0)
+    assert_balanced(tracker)
+
+
+@with_setup(setup_func)
+def sample_test():
+    tracker('turn_start', 2)
+    tracker('turn_end', 2)
+    random_state = numpy.random.RandomState(1)
+    for deal in range(20):
+        hands, boneyard = tracker.sample(random_state)
+        assert_equal(hands[0], board.hands[0])
+        assert_equal([len(hand) for hand in hands], [2, 3, 3])
+        assert_equal(len(boneyard), 16)
+        dealt = hands[1] + hands[2] + boneyard
+        assert_equal(len(set(dealt)), len(dealt))
+        assert (0, 6) not in hands[2]
+        assert (3, 6) not in hands[2]
+    solver = EndgameSolver(6)
+    state = solver.position(board, 0, True, hands=hands)
+    assert solver.moves(state)
+
+
+def engine_events_test():
+    for seed in range(10):
+        engine = Engine(0, 3, 9, seed)
+        engine.seat_players([AI] * 3)
+        tracker = BeliefTracker(engine.board, 1)
+        checks = []
+
+        def check(event, *args):
+            if event == 'turn_end':
+                for player in (0, 2):
+                    checks.append(all(tracker.probability(player, domino) > 0
+                                      for domino in engine.board.hands[player]))
+        engine.board.listeners.append(check)
+        engine.run_game()
+        assert all(checks)
+
+
+@with_setup(setup_func)
+def inference_endgame_ai_test():
+    board.boneyard = []
+    player = InferenceEndgameAI(board, 0)
+    hands = player.endgame_hands()
+    assert_equal(hands[0], board.hands[0])
+    assert_equal([len(hand) for hand in hands], [2, 3, 3])
+    assert_equal(len(set(hands[1] + hands[2])), 6)
+    assert all(player.beliefs.unseen()[player.beliefs.ids[domino]] for domino in hands[1] + hands[2])
+    for seed in range(5):
+        engine = Engine(0, 4, 9, seed)
+        engine.seat_players([InferenceEndgameAI, AI, InferenceEndgameAI, AI])
+        assert engine.run_game() in range(4)
@@ -0,0 +1,116 @@
+from nose.tools import *
+from train.train import AI, Engine, Player, SetupError
+from train.persistence import *
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+
+def setup_func():
+    global directory
+    directory = tempfile.mkdtemp()
+
+
+def teardown_func():
+    shutil.rmtree(directory)
+
+
+class UnregisteredAI(AI):
+    pass
+
+
+def started_engine(seed, turns):
+    engine = Engine(0, 4, seed=seed)
+    engine.seat_players([AI] * 4)
+    engine.start_game()
+    for turn in range(turns):
+        engine.play_turn()
+    return engine
+
+
+def round_trip_test():
+    engine = started_engine(4, 9)
+    restored = loads(dumps(engine))
+    assert_equal(restored.board.board, engine.board.board)
+    assert_equal(restored.board.hands, engine.board.hands)
+    assert_equal(restored.board.boneyard, engine.board.boneyard)
+    assert_equal(restored.board.last_played, engine.board.last_played)
+    assert_equal(restored.board.current_player, engine.board.current_player)
+    assert_equal(str(restored.board), str(engine.board))
+    assert "u'" not in str(restored.board)
+    assert_equal([player.own_train_started for player in restored.players],
+                 [player.own_train_started for player in engine.players])
+    assert restored.players[0].hand is restored.board.hands[0]
+    assert_equal(restored.play_game(), engine.play_game())
+    assert_equal(restored.scores, engine.scores)
+    assert_raises(SetupError, restored.play_game)
+
+
+def unregistered_player_test():
+    engine = Engine(0, 2)
+    engine.seat_players([AI, UnregisteredAI])
+    assert_raises(ValueError, dumps, engine)
+    register_player_type(UnregisteredAI)
+    try:
+        assert_equal(type(loads(dumps(engine)).players[1]), UnregisteredAI)
+    finally:
+        del PLAYER_TYPES['UnregisteredAI']
+
+
+def finish_table(directory, table_id):
+    store = TableStore(directory)
+    engine = store.load(table_id)
+    store.attach(table_id, engine)
+    engine.play_game()
+
+
+@with_setup(setup_func, teardown_func)
+def checkpoint_in_other_process_test():
+    store = TableStore(directory)
+    engine = started_engine(11, 0)
+    store.attach('table-1', engine)
+    for turn in range(6):
+        engine.play_turn()
+    saved = store.load('table-1')
+    assert_equal(saved.board.board, engine.board.board)
+    assert_equal(store.table_ids(), ['table-1'])
+    process = multiprocessing.Process(target=finish_table, args=(directory, 'table-1'))
+    process.start()
+    process.join()
+    assert_equal(process.exitcode, 0)
+    engine.play_game()
+    finished = store.load('table-1')
+    assert_equal(finished.scores, engine.scores)
+    assert not finished.playing
+    store.delete('table-1')
+    assert_equal(store.table_ids(), [])
+
+
+@with_setup(setup_func, teardown_func)
+def table_id_encoding_test():
+    store = TableStore(os.path.join(directory, 'store'))
+    engine = started_engine(3, 2)
+    table_ids = ['../outside', '/etc/x', '..', 'a b%2F']
+    for table_id in table_ids:
+        store.save(table_id, engine)
+    assert_equal(os.listdir(directory), ['store'])
+    assert_equal(store.table_ids(), sorted(table_ids))
+    for table_id in table_ids:
+        assert_equal(store.load(table_id).board.board, engine.board.board)
+        store.delete(table_id)
+    assert_equal(os.listdir(store.directory), [])
+
+
+def shard_router_test():
+    router = ShardRouter(['node-a', 'node-b', 'node-c'])
+    tables = ['table-%d' % idx for idx in range(300)]
+    owners = dict((table, router.node_for(table)) for table in tables)
+    assert_equal(sorted(set(owners.values())), ['node-a', 'node-b', 'node-c'])
+    assert_equal(sum(len(router.tables_for(node, tables)) for node in router.nodes), 300)
+    router.add_node('node-d')
+    for table in tables:
+        assert router.node_for(table) in (owners[table], 'node-d')
+    router.remove_node('node-d')
+    assert_equal(dict((table, router.node_for(table)) for table in tables), owners)
+    assert_raises(ValueError, ShardRouter([]).node_for, 'table-1')
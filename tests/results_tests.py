@@ -0,0 +1,66 @@
+from nose.tools import *
+from train.train import AI, Engine
+from train.results import *
+import os
+import shutil
+import tempfile
+
+
+def setup_func():
+    global directory
+    directory = tempfile.mkdtemp()
+
+
+def teardown_func():
+    shutil.rmtree(directory)
+
+
+@with_setup(setup_func, teardown_func)
+def chunked_writer_test():
+    prefix = os.path.join(directory, 'sub', 'numbers')
+    with ChunkedWriter(prefix, [('a', numpy.int32), ('b', numpy.float64)], chunk_size=4) as writer:
+        for value in range(10):
+            writer.append(value, value / 2.0)
+        assert_equal(writer.chunks, 2)
+    assert_equal(sorted(os.listdir(os.path.join(directory, 'sub'))),
+                 ['numbers-00000.npz', 'numbers-00001.npz', 'numbers-00002.npz'])
+    columns = load_columns(prefix)
+    assert_equal(columns['a'].tolist(), list(range(10)))
+    assert_equal(columns['b'].dtype, numpy.float64)
+    assert_equal(columns['b'][3], 1.5)
+
+
+@with_setup(setup_func, teardown_func)
+def load_missing_test():
+    assert_raises(IOError, load_columns, os.path.join(directory, 'nothing'))
+
+
+@with_setup(setup_func, teardown_func)
+def existing_chunks_test():
+    record_games([AI, AI], range(20), directory, chunk_size=8)
+    assert_raises(IOError, record_games, [AI, AI], range(3), directory, chunk_size=8)
+    assert_equal(len(load_columns(os.path.join(directory, 'rounds'))['seed']), 40)
+    other = os.path.join(directory, 'other')
+    record_games([AI, AI], range(3), other, chunk_size=8)
+    assert_equal(len(load_columns(os.path.join(other, 'rounds'))['seed']), 6)
+
+
+@with_setup(setup_func, teardown_func)
+def record_games_test():
+    record_games([AI, AI, AI], range(5), directory, chunk_size=16)
+    rounds = load_columns(os.path.join(directory, 'rounds'))
+    moves = load_columns(os.path.join(directory, 'moves'))
+    assert_equal(len(rounds['seed']), 15)
+    assert_equal(rounds['winner'].sum(), 5)
+    assert_equal(sorted(set(moves['seed'].tolist())), list(range(5)))
+    for seed in range(5):
+        engine = Engine(0, 3, seed=seed)
+        engine.seat_players([AI, AI, AI])
+        winner = engine.run_game()
+        selected = rounds['seed'] == seed
+        assert_equal(rounds['pips'][selected].tolist(), engine.scores)
+        assert rounds['winner'][selected][winner]
+        seed_moves = moves['seed'] == seed
+        assert_equal((moves['action'][seed_moves] == DRAW).sum(), rounds['draws'][selected].sum())
+    assert (moves['train'][moves['action'] == DRAW] == -1).all()
+    assert (moves['seconds'] >= 0).all()
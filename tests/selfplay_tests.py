@@ -0,0 +1,96 @@
+from nose.tools import *
+from train.train import Board
+from train.results import load_columns
+from train.selfplay import *
+import os
+import shutil
+import signal
+import tempfile
+
+
+class KilledAI(RecordingAI):
+    def choose_move(self, drawn):
+        os.kill(os.getpid(), signal.SIGKILL)
+
+
+class ExitingAI(RecordingAI):
+    def choose_move(self, drawn):
+        os._exit(0)
+
+
+def setup_func():
+    global directory
+    directory = tempfile.mkdtemp()
+
+
+def teardown_func():
+    shutil.rmtree(directory)
+
+
+def action_space_test():
+    board = Board(2, 6)
+    board.board = [[(0, 'closed'), (6, 6)],
+                   [(1, 'closed'), (6, 6)],
+                   [('mex', 'open'), (6, 6)]
+                   ]
+    board.hands = [[(1, 2), (3, 6)], []]
+    board.boneyard = [(0, 0)]
+    player = RecordingAI(board, 0)
+    player.own_train_started = True
+    actions = ActionSpace(2, 6)
+    assert_equal(actions.size, 3 * 28 + 2)
+    assert_equal(actions.decode(player, actions.encode(player, (1, 2))), (1, 2))
+    assert_equal(actions.encode(player, 'draw'), actions.draw_action)
+    assert_equal(actions.decode(player, actions.pass_action), 'pass')
+    legal = actions.legal(player, False)
+    assert_equal([actions.decode(player, action) for action in legal], [(1, 0), (1, 2), 'draw'])
+    del player.hand[1]
+    assert_equal(actions.legal(player, True), [actions.pass_action])
+
+
+@with_setup(setup_func, teardown_func)
+def generate_test():
+    written = generate(directory, 6, num_players=3, max_domino=9, workers=0, shard_size=50)
+    records = load_columns(os.path.join(directory, 'selfplay'))
+    assert_equal(len(records['action']), written)
+    # Seed 0 is won during the first turns, which are not recorded.
+    assert_equal(sorted(set(records['seed'].tolist())), list(range(1, 6)))
+    assert records['legal'][numpy.arange(written), records['action']].all()
+    assert_equal(records['features'].shape[1], FeatureExtractor(3, 9).size)
+    for seed in range(1, 6):
+        game = records['seed'] == seed
+        assert_equal(len(set(records['seat'][game][records['won'][game]].tolist())), 1)
+
+
+@with_setup(setup_func, teardown_func)
+def worker_processes_test():
+    written = generate(directory, 6, num_players=3, max_domino=9, workers=2)
+    records = load_columns(os.path.join(directory, 'selfplay'))
+    single = list(play_games(range(6), 3, 9))
+    assert_equal(written, sum(len(game['action']) for game in single))
+    order = numpy.lexsort((numpy.arange(written), records['seed']))
+    assert_equal(records['action'][order].tolist(), numpy.concatenate([game['action'] for game in single]).tolist())
+
+
+@with_setup(setup_func, teardown_func)
+def killed_worker_test():
+    assert_raises(RuntimeError, generate, directory, 4, num_players=3, max_domino=9, player_type=KilledAI, workers=2,
+                  poll_seconds=0.1)
+
+
+@with_setup(setup_func, teardown_func)
+def exited_worker_test():
+    assert_raises(RuntimeError, generate, directory, 4, num_players=3, max_domino=9, player_type=ExitingAI, workers=2,
+                  poll_seconds=0.1)
+
+
+def short_poll_test():
+    # Waits that give up just before the last records arrive must not lose them.
+    expected = sum(len(game['action']) for game in play_games(range(6), 3, 9))
+    for run in range(10):
+        directory = tempfile.mkdtemp()
+        try:
+            assert_equal(generate(directory, 6, num_players=3, max_domino=9, workers=3, poll_seconds=0.0001),
+                         expected)
+        finally:
+            shutil.rmtree(directory)
@@ -108,7 +108,7 @@ def deal_test():
 def draw_test():
     board = Board(4)
     board.make_dom_set()
-    board.boneyard = board.domino_set
+    board.boneyard = list(board.domino_set)
     hand_len = len(board.hands[0])
     board.hands[0].append(board.draw())
     assert_equal(hand_len, len(board.hands[0]) - 1)
@@ -158,8 +158,19 @@ def make_dom_set_test():
     assert_equal(len(board.domino_set), 55)
 
 
+def domino_set_test():
+    assert domino_set(6) is domino_set(6)
+    assert Board(4, 6).domino_set is domino_set(6)
+    assert_equal(len(domino_set(12)), 91)
+    board = Board(2, 6)
+    board.deal()
+    assert_equal(len(board.boneyard) + len(board.hands[0]) + len(board.hands[1]), 28)
+    assert_equal(len(domino_set(6)), 28)
+
+
 def new_game_test():
-    board = Board(4)
+    # Seeded so that player 0 does not hold the starting double.
+    board = Board(4, seed=0)
     expected_board = Board(4)
     expected_board.board = [[(0, 'closed'), (10, 10)],
                             [(1, 'closed'), (10, 10)],
@@ -244,5 +255,72 @@ def play_test():
     assert_equal(board.board, board_expected)
 
 
+def seeded_deal_test():
+    board1 = Board(4, seed=3)
+    board2 = Board(4, seed=3)
+    board1.new_game()
+    board2.new_game()
+    assert_equal(board1.hands, board2.hands)
+    assert_equal(board1.board, board2.board)
+
+
+def seeded_seating_test():
+    seatings = set()
+    for run in range(5):
+        engine = Engine(2, 3, seed=8)
+        seatings.add(tuple(type(player) for player in engine.players))
+    assert_equal(len(seatings), 1)
+
+
+def impossible_deal_test():
+    assert_raises(SetupError, Board(20, 6).new_game)
+    assert_raises(SetupError, Board(2, 0).new_game)
+    assert_raises(SetupError, Engine(0, 20, 6).run_game)
+
+
+def seat_players_test():
+    engine = Engine(0, 3)
+    engine.seat_players([AI, Player, AI])
+    assert_equal([type(player) for player in engine.players], [AI, Player, AI])
+    assert_equal([player.player_num for player in engine.players], [0, 1, 2])
+    assert_raises(SetupError, engine.seat_players, [AI])
+
+
+def run_game_test():
+    for seed in range(20):
+        engine = Engine(0, 4, seed=seed)
+        winner = engine.run_game()
+        assert winner in range(4)
+        assert_equal(engine.scores, [engine.board.pip_count(player) for player in range(4)])
+        assert_equal(engine.scores[winner], min(engine.scores))
 
 
+@with_setup(setup_func)
+def longest_train_test():
+    board = Board(4)
+    board.board = test_board2
+    board.hands = [[(2, 12), (2, 5), (5, 12), (12, 11), (3, 4)], [], [], []]
+    player = AI(board, 0)
+    assert_equal(player.longest_train(), [(2, 12), (2, 5), (5, 12), (12, 11)])
+    player.play_first_move()
+    assert_equal(board.board[0][2:], [(12, 2), (2, 5), (5, 12), (12, 11)])
+    assert_equal(player.hand, [(3, 4)])
+    assert player.own_train_started
+
+
+@with_setup(setup_func)
+def allocation_free_moves_test():
+    board = Board(4)
+    board.board = test_board2
+    board.hands = test_hands1
+    player = AI(board, 0)
+    player.own_train_started = True
+    assert not hasattr(board, '__dict__')
+    assert not hasattr(player, '__dict__')
+    moves = player.get_moves()
+    assert player.get_moves() is moves
+    assert_equal(moves, [[4, 5], [], [], [], [4, 5]])
+    assert_equal(board.check_move((11, 12), 0, 0), (12, 11))
+    assert board.check_move((11, 12), 0, 0) is board.check_move((11, 12), 0, 0)
+    player.play(4, 0)
+    assert board.board[0][0] is player.closed_header
@@ -0,0 +1,398 @@
+"""
+Exact endgame search for the part of a round played after the boneyard runs out.
+
+Once nothing is left to draw, the rest of the round can be searched as a game of perfect information given every hand.
+EndgameSolver searches it with alpha-beta under the "paranoid" assumption that every opponent plays against the
+searching player, following the engine's rules: players on their first turn may only play on their own train and may
+stop after any play, a player's train opens at the start of their turn and closes when they play on it, a double must be
+backed up on its train before anything else is played, a player who cannot move passes, and the round is blocked once
+every player has passed in a row.
+
+A position is scored from the searching player's point of view: WIN minus the pips they are left with if they win the
+round, minus their pips otherwise. Searches are iteratively deepened, moves are tried doubles first then by pips, and
+a transposition table keeps results between iterations and between moves. When the node budget runs out before the
+endgame is solved, the best move of the deepest finished iteration is played.
+
+EndgameAI plays like AI until the boneyard is empty and then asks the solver for every move. Only in a two player game
+does an empty boneyard reveal the other hand (it holds every domino that cannot be seen), so with more players, where
+the split of the unseen dominoes between opponents is hidden, EndgameAI keeps playing like AI instead of searching on
+hands it could not know. train.inference.InferenceEndgameAI searches those endgames on deals sampled from what the
+player has seen.
+"""
+
+from __future__ import absolute_import
+
+__author__ = 'Vince'
+
+from train.train import AI, domino_set
+
+WIN = 10000
+EXACT = 0
+LOWER = 1
+UPPER = 2
+SOLVED = 1 << 30  # Depth recorded for results that did not rely on the heuristic
+END = None  # Move that ends the turn: passing, or stopping a first turn train
+
+# Fields of a position tuple.
+HANDS = 0
+ENDS = 1
+OPEN = 2
+PENDING = 3
+STARTED = 4
+PLAYER = 5
+PLAYED = 6
+CHAIN = 7
+IDLE = 8
+
+_tables = {}
+
+
+class OutOfBudget(Exception):
+    pass
+
+
+class DominoTables(object):
+    """
+    Lookup tables for the dominoes of one set. Hands are stored as bit masks of domino ids.
+    """
+
+    def __init__(self, max_domino):
+        self.dominoes = domino_set(max_domino)
+        self.ids = {}
+        for idx, domino in enumerate(self.dominoes):
+            self.ids[domino] = idx
+            self.ids[(domino[1], domino[0])] = idx
+        self.pips = [side1 + side2 for side1, side2 in self.dominoes]
+        self.with_value = [0] * (max_domino + 1)
+        for idx, (side1, side2) in enumerate(self.dominoes):
+            self.with_value[side1] |= 1 << idx
+            self.with_value[side2] |= 1 << idx
+        # Lower sorts first: doubles, then dominoes with more pips.
+        self.order = [(side1 != side2, -(side1 + side2)) for side1, side2 in self.dominoes]
+
+    def mask(self, hand):
+        result = 0
+        for domino in hand:
+            result |= 1 << self.ids[domino]
+        return result
+
+    def pip_count(self, mask):
+        total = 0
+        while mask:
+            low = mask & -mask
+            total += self.pips[low.bit_length() - 1]
+            mask ^= low
+        return total
+
+
+def tables(max_domino):
+    try:
+        return _tables[max_domino]
+    except KeyError:
+        return _tables.setdefault(max_domino, DominoTables(max_domino))
+
+
+class EndgameSolver(object):
+    """
+    Alpha-beta search over positions built by position().
+    """
+
+    def __init__(self, max_domino=12, node_limit=5000, max_depth=200, table_limit=200000):
+        """
+        :param max_domino:
+        :param node_limit: positions searched per move at most
+        :param max_depth: deepest iteration tried, in single plays
+        :param table_limit: transposition table entries kept before the table is cleared
+        """
+        self.tables = tables(max_domino)
+        self.node_limit = node_limit
+        self.max_depth = max_depth
+        self.table_limit = table_limit
+        self.table = {}
+        self.nodes = 0
+
+    def position(self, board, player_num, own_train_started, played=False, idle_turns=0, hands=None):
+        """
+        Builds the position of a player about to move.
+        :param board:
+        :param player_num:
+        :param own_train_started: the player's own_train_started
+        :param played: True if the player has already played this turn
+        :param idle_turns: turns in a row in which nothing was drawn or played, as counted by the Engine
+        :param hands: hands to search with instead of board.hands, such as a deal sampled by a BeliefTracker
+        :return:
+        """
+        # Only a player's first turn plays can reach their closed train, so any train longer than its header and
+        # starting double belongs to a player past their first turn.
+        started = [len(board.board[player]) > 2 for player in range(board.num_players)]
+        started[player_num] = own_train_started
+        if hands is None:
+            hands = board.hands
+        return (
+            tuple(self.tables.mask(hand) for hand in hands),
+            tuple(train[-1][1] if len(train) > 1 else None for train in board.board),
+            tuple(train[0][1] == 'open' for train in board.board),
+            board.last_played[1] if board.check_double('last') else -1,
+            tuple(started),
+            player_num,
+            played,
+            played and not own_train_started,
+            idle_turns,
+        )
+
+    def moves(self, state):
+        """
+        Returns the moves available in a position, best first. A move is END or (domino_id, train_num).
+        :param state:
+        :return:
+        """
+        player = state[PLAYER]
+        hand = state[HANDS][player]
+        ends = state[ENDS]
+        if not state[STARTED][player]:
+            trains = (player,)
+        elif state[PENDING] >= 0:
+            trains = (state[PENDING],)
+        else:
+            trains = range(len(ends))
+        result = []
+        for train_num in trains:
+            if train_num != player and not state[OPEN][train_num] or ends[train_num] is None:
+                continue
+            playable = hand & self.tables.with_value[ends[train_num]]
+            while playable:
+                low = playable & -playable
+                result.append((low.bit_length() - 1, train_num))
+                playable ^= low
+        order = self.tables.order
+        result.sort(key=lambda move: order[move[0]])
+        # Moves are compulsory, except that a first turn train may stop after any play.
+        if not result or state[CHAIN]:
+            result.append(END)
+        return result
+
+    def apply(self, state, move, root):
+        """
+        Returns (next position, None), or (None, value) if the move ends the round.
+        :param state:
+        :param move:
+        :param root: player the value is computed for
+        :return:
+        """
+        if move is END:
+            return self.end_turn(state, root)
+        player = state[PLAYER]
+        domino_id, train_num = move
+        side1, side2 = self.tables.dominoes[domino_id]
+        hands = list(state[HANDS])
+        hands[player] &= ~(1 << domino_id)
+        ends = list(state[ENDS])
+        ends[train_num] = side2 if side1 == ends[train_num] else side1
+        opened = state[OPEN]
+        if train_num == player and opened[player]:
+            opened = opened[:player] + (False,) + opened[player + 1:]
+        pending = train_num if side1 == side2 else -1
+        following = (tuple(hands), tuple(ends), opened, pending, state[STARTED], player, True,
+                     not state[STARTED][player], state[IDLE])
+        # A first turn train and a double both leave the same player to move.
+        if following[CHAIN] or pending >= 0:
+            return following, None
+        return self.end_turn(following, root)
+
+    def end_turn(self, state, root):
+        player = state[PLAYER]
+        hands = state[HANDS]
+        num_players = len(hands)
+        started = state[STARTED]
+        if state[CHAIN]:
+            started = started[:player] + (True,) + started[player + 1:]
+        idle = 0 if state[PLAYED] else state[IDLE] + 1
+        if state[PENDING] < 0:
+            for winner, hand in enumerate(hands):
+                if not hand:
+                    return None, self.score(hands, winner, root)
+        if idle >= num_players:
+            pips = [self.tables.pip_count(hand) for hand in hands]
+            return None, self.score(hands, pips.index(min(pips)), root)
+        following = (player + 1) % num_players
+        opened = state[OPEN]
+        if started[following] and not opened[following]:
+            opened = opened[:following] + (True,) + opened[following + 1:]
+        return (hands, state[ENDS], opened, state[PENDING], started, following, False, False, idle), None
+
+    def score(self, hands, winner, root):
+        pips = self.tables.pip_count(hands[root])
+        if winner == root:
+            return WIN - pips
+        return -pips
+
+    def heuristic(self, state, root):
+        """
+        Estimate used when the search stops before the round ends: the fewest pips held by an opponent minus the
+        player's own pips.
+        """
+        hands = state[HANDS]
+        opponents = min(self.tables.pip_count(hand) for player, hand in enumerate(hands) if player != root)
+        return opponents - self.tables.pip_count(hands[root])
+
+    def search(self, state, depth, alpha, beta, root):
+        """
+        Returns (value, solved). solved is True if the value does not depend on the heuristic.
+        """
+        self.nodes += 1
+        if self.nodes > self.node_limit:
+            raise OutOfBudget
+        key = (root, state)
+        entry = self.table.get(key)
+        best_move = None
+        if entry is not None:
+            entry_depth, value, flag, best_move = entry
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return value, entry_depth == SOLVED
+                elif flag == LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value, entry_depth == SOLVED
+        if depth == 0:
+            return self.heuristic(state, root), False
+        moves = self.moves(state)
+        if best_move in moves:
+            moves.remove(best_move)
+            moves.insert(0, best_move)
+        maximizing = state[PLAYER] == root
+        first_alpha, first_beta = alpha, beta
+        best_value = -float('inf') if maximizing else float('inf')
+        solved = True
+        for move in moves:
+            following, value = self.apply(state, move, root)
+            if following is not None:
+                value, child_solved = self.search(following, depth - 1, alpha, beta, root)
+                solved = solved and child_solved
+            if maximizing and value > best_value:
+                best_value, best_move = value, move
+                alpha = max(alpha, value)
+            elif not maximizing and value < best_value:
+                best_value, best_move = value, move
+                beta = min(beta, value)
+            if alpha >= beta:
+                break
+        if best_value <= first_alpha:
+            flag = UPPER
+        elif best_value >= first_beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table[key] = (SOLVED if solved else depth, best_value, flag, best_move)
+        return best_value, solved
+
+    def best_move(self, state):
+        """
+        Returns (move, value, solved) for the player to move. value is None if not even a one move search fit in the
+        node budget.
+        :param state:
+        :return:
+        """
+        root = state[PLAYER]
+        moves = self.moves(state)
+        if len(moves) == 1:
+            return moves[0], None, False
+        if len(self.table) > self.table_limit:
+            self.table.clear()
+        self.nodes = 0
+        best, value, solved = moves[0], None, False
+        try:
+            for depth in range(1, self.max_depth + 1):
+                value, solved = self.search(state, depth, -float('inf'), float('inf'), root)
+                best = self.table[(root, state)][3]
+                if solved:
+                    break
+        except OutOfBudget:
+            pass
+        return best, value, solved
+
+
+class TurnTracker(object):
+    """
+    Board listener that follows what the Engine knows about the current turn: whether anything has been played in it
+    and how many turns in a row nothing was drawn or played.
+    """
+
+    def __init__(self):
+        self.idle_turns = 0
+        self.played = False
+        self.progress = False
+
+    def __call__(self, event, *args):
+        if event == 'new_game':
+            self.idle_turns = 0
+        elif event == 'turn_start':
+            self.played = False
+            self.progress = False
+        elif event == 'play':
+            self.played = True
+            self.progress = True
+        elif event == 'draw':
+            self.progress = True
+        elif event == 'turn_end':
+            self.idle_turns = 0 if self.progress else self.idle_turns + 1
+
+
+class EndgameAI(AI):
+    """
+    AI that searches for the best move once the boneyard is empty.
+    """
+    __slots__ = ('solver', 'tracker')
+    node_limit = 5000
+
+    def __init__(self, board, player_num):
+        AI.__init__(self, board, player_num)
+        self.solver = EndgameSolver(board.max_domino, self.node_limit)
+        self.tracker = TurnTracker()
+        board.listeners.append(self.tracker)
+
+    def endgame_hands(self):
+        """
+        Returns the hands to search with, or None to play like AI: while the boneyard still has dominoes, and when the
+        other hands cannot be known because more than one opponent may hold the unseen dominoes.
+        :return:
+        """
+        if self.board.boneyard or self.board.num_players != 2:
+            return None
+        return self.board.hands
+
+    def solve(self, hands):
+        """
+        Returns the solver's move for the current position in Player.play arguments, or None to end the turn.
+        :param hands: hands to search with, from endgame_hands
+        :return:
+        """
+        state = self.solver.position(self.board, self.player_num, self.own_train_started, self.tracker.played,
+                                     self.tracker.idle_turns, hands)
+        move = self.solver.best_move(state)[0]
+        if move is END:
+            return None
+        domino_id, train_num = move
+        ids = self.solver.tables.ids
+        for idx, domino in enumerate(self.hand):
+            if ids[domino] == domino_id:
+                return idx, train_num
+
+    def select_move(self, moves):
+        hands = self.endgame_hands()
+        if hands is None:
+            return AI.select_move(self, moves)
+        return self.solve(hands)
+
+    def play_first_move(self):
+        hands = self.endgame_hands()
+        if hands is None:
+            return AI.play_first_move(self)
+        move = self.solve(hands)
+        while move is not None:
+            self.play(*move)
+            move = self.solve(self.endgame_hands())
+        if self.tracker.played:
+            self.own_train_started = True
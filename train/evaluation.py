@@ -0,0 +1,204 @@
+"""
+Compares two computer strategies by letting them play each other until the difference between them is significant.
+
+Every trial is one seed played once per seat rotation, so both strategies get every dealt hand and every seat. The
+challenger's share of the wins and its average pip advantage are pushed into running statistics after each trial and
+the comparison stops as soon as the confidence interval of the chosen measure excludes "no difference", or when the
+maximum number of trials has been played.
+
+Because the interval is checked after every trial, a fixed normal interval would declare a difference between equal
+strategies far more often than its nominal level. The intervals used for stopping are confidence sequences instead
+(normal mixture boundary, Howard et al. 2021): they hold at every trial at once, so stopping the first time one excludes
+zero keeps the false positive rate at about alpha. The variance is estimated from the trials played so far.
+
+Usage:
+    comparison = Comparison(MyAI, AI)
+    comparison.run()
+    print comparison.summary()
+"""
+
+from __future__ import absolute_import, division
+
+__author__ = 'Vince'
+
+import math
+
+from train.train import Engine
+
+
+class RunningStat(object):
+    """
+    Mean and variance of a stream of numbers, updated one value at a time (Welford's method).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.sum_squares = 0.0
+
+    def push(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.sum_squares += delta * (value - self.mean)
+
+    def variance(self):
+        if self.count < 2:
+            return float('inf')
+        return self.sum_squares / (self.count - 1)
+
+    def std_error(self):
+        if self.count < 2:
+            return float('inf')
+        return math.sqrt(self.variance() / self.count)
+
+    def interval(self, z):
+        """
+        Returns the (low, high) normal approximation confidence interval of the mean.
+        :param z: number of standard errors on each side, 1.96 for 95%
+        :return:
+        """
+        margin = z * self.std_error()
+        return self.mean - margin, self.mean + margin
+
+    def sequence_interval(self, alpha, rho=10.0):
+        """
+        Returns the (low, high) confidence sequence of the mean: with probability about 1 - alpha the mean lies in
+        every interval returned, whenever the stream is checked.
+        :param alpha: chance of ever excluding the mean
+        :param rho: mixture width in trials, smaller values give tighter intervals early and wider ones later
+        :return:
+        """
+        if self.count < 2:
+            return -float('inf'), float('inf')
+        count = self.count
+        margin = math.sqrt(self.variance() * (count + rho) * math.log((count + rho) / (rho * alpha ** 2))) / count
+        return self.mean - margin, self.mean + margin
+
+
+def play_match(player_types, seed, max_domino=12):
+    """
+    Plays one round with the given player classes seated in order and a seeded deal.
+    :param player_types: list of AI subclasses, one per seat
+    :param seed:
+    :param max_domino:
+    :return (winner, list of pips left per seat):
+    """
+    engine = Engine(0, len(player_types), max_domino, seed)
+    engine.seat_players(player_types)
+    winner = engine.run_game()
+    return winner, engine.scores
+
+
+class Comparison(object):
+    """
+    Seat-rotated, seed-paired comparison of a challenger strategy against a baseline strategy.
+    """
+
+    measures = ('win_rate', 'score')
+
+    def __init__(self, challenger, baseline, num_players=2, max_domino=12, measure='win_rate', alpha=0.01,
+                 min_trials=20, max_trials=1000, first_seed=0, rho=10.0):
+        """
+        :param challenger: AI subclass being evaluated
+        :param baseline: AI subclass it is compared with
+        :param num_players: seats per game, filled alternately by challenger and baseline
+        :param max_domino:
+        :param measure: 'win_rate' or 'score', the measure used for stopping
+        :param alpha: chance of declaring a difference between equally good strategies
+        :param min_trials: trials always played before stopping early
+        :param max_trials: trials played at most
+        :param first_seed: seed of the first trial, later trials use the following seeds
+        :param rho: mixture width of the confidence sequences, see RunningStat.sequence_interval
+        """
+        if measure not in self.measures:
+            raise ValueError("measure must be one of %s" % ", ".join(self.measures))
+        if num_players < 2:
+            raise ValueError("A comparison needs at least two seats.")
+        self.challenger = challenger
+        self.baseline = baseline
+        self.num_players = num_players
+        self.max_domino = max_domino
+        self.measure = measure
+        self.alpha = alpha
+        self.rho = rho
+        self.min_trials = min_trials
+        self.max_trials = max_trials
+        self.next_seed = first_seed
+        # Seats alternate between the two strategies, True marking the challenger's seats.
+        self.challenger_seats = [seat % 2 == 0 for seat in range(num_players)]
+        # Share of the wins the challenger gets when both strategies are equally good.
+        self.expected_share = self.challenger_seats.count(True) / num_players
+        self.win_share = RunningStat()
+        self.pip_advantage = RunningStat()
+        self.games = 0
+
+    def run_trial(self):
+        """
+        Plays the next seed once for every rotation of the seating and records the result.
+        :return:
+        """
+        seed = self.next_seed
+        self.next_seed += 1
+        wins = 0
+        challenger_pips = []
+        baseline_pips = []
+        for rotation in range(self.num_players):
+            roles = self.challenger_seats[rotation:] + self.challenger_seats[:rotation]
+            seating = [self.challenger if role else self.baseline for role in roles]
+            winner, pips = play_match(seating, seed, self.max_domino)
+            self.games += 1
+            if roles[winner]:
+                wins += 1
+            for seat, role in enumerate(roles):
+                if role:
+                    challenger_pips.append(pips[seat])
+                else:
+                    baseline_pips.append(pips[seat])
+        self.win_share.push(wins / self.num_players - self.expected_share)
+        # Pips left count against a player, so a positive advantage favours the challenger.
+        self.pip_advantage.push(sum(baseline_pips) / len(baseline_pips) - sum(challenger_pips) / len(challenger_pips))
+
+    def statistic(self):
+        if self.measure == 'win_rate':
+            return self.win_share
+        return self.pip_advantage
+
+    def significant(self):
+        """
+        Returns True once the confidence interval of the chosen measure no longer contains zero.
+        :return:
+        """
+        low, high = self.statistic().sequence_interval(self.alpha, self.rho)
+        return low > 0 or high < 0
+
+    def finished(self):
+        trials = self.statistic().count
+        if trials >= self.max_trials:
+            return True
+        return trials >= self.min_trials and self.significant()
+
+    def run(self):
+        """
+        Plays trials until the comparison is significant or the trial budget is spent.
+        :return self:
+        """
+        while not self.finished():
+            self.run_trial()
+        return self
+
+    def summary(self):
+        """
+        Returns the results so far as a dictionary. Win rates are the challenger's share of the wins.
+        :return:
+        """
+        win_low, win_high = self.win_share.sequence_interval(self.alpha, self.rho)
+        return {
+            'trials': self.win_share.count,
+            'games': self.games,
+            'win_rate': self.win_share.mean + self.expected_share,
+            'win_rate_interval': (win_low + self.expected_share, win_high + self.expected_share),
+            'pip_advantage': self.pip_advantage.mean,
+            'pip_advantage_interval': self.pip_advantage.sequence_interval(self.alpha, self.rho),
+            'significant': self.significant(),
+        }
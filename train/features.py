@@ -0,0 +1,117 @@
+"""
+Turns game positions into dense feature vectors for learned strategies.
+
+A position is a Board seen by one player. The vector holds, in order:
+    hand: number of domino halves in the player's hand showing each pip value (a double counts twice)
+    ends: number of trains the player may play on that end with each pip value
+    trains: 1 for every train the player may play on, 0 otherwise
+    double_pending: 1 if the last domino played is a double that still has to be backed up
+    hand_size: number of dominoes in the player's hand
+    boneyard: number of dominoes left in the boneyard
+
+Features are written straight into rows of a caller supplied array, so batches can reuse one preallocated buffer.
+
+Usage:
+    extractor = FeatureExtractor(4)
+    out = extractor.allocate(len(positions))
+    extractor.extract_batch(positions, out)
+"""
+
+from __future__ import absolute_import
+
+__author__ = 'Vince'
+
+import numpy
+
+
+class FeatureExtractor(object):
+    """
+    Computes feature vectors for boards with a fixed number of players and maximum domino.
+    """
+
+    def __init__(self, num_players, max_domino=12, dtype=numpy.float32):
+        self.num_players = num_players
+        self.max_domino = max_domino
+        self.dtype = dtype
+        values = max_domino + 1
+        self.hand_offset = 0
+        self.ends_offset = values
+        self.trains_offset = 2 * values
+        self.double_offset = self.trains_offset + num_players + 1
+        self.hand_size_offset = self.double_offset + 1
+        self.boneyard_offset = self.hand_size_offset + 1
+        self.size = self.boneyard_offset + 1
+
+    def names(self):
+        """
+        Returns the name of every feature in vector order.
+        :return:
+        """
+        values = range(self.max_domino + 1)
+        names = ['hand_%d' % value for value in values]
+        names += ['ends_%d' % value for value in values]
+        names += ['train_%d' % train for train in range(self.num_players)] + ['train_mex']
+        names += ['double_pending', 'hand_size', 'boneyard']
+        return names
+
+    def allocate(self, count):
+        """
+        Returns an uninitialised array for count positions.
+        :param count:
+        :return:
+        """
+        return numpy.empty((count, self.size), self.dtype)
+
+    def check(self, board):
+        """
+        Raises ValueError if the board does not have the extractor's number of players and maximum domino.
+        :param board:
+        :return:
+        """
+        if len(board.board) != self.num_players + 1 or board.max_domino != self.max_domino:
+            raise ValueError("Extractor for %d players and max domino %d cannot read a board with %d trains and max "
+                             "domino %d." % (self.num_players, self.max_domino, len(board.board), board.max_domino))
+
+    def extract(self, board, player_num, out):
+        """
+        Writes the features of a position into out.
+        :param board: Board with the extractor's number of players and maximum domino
+        :param player_num: player whose point of view is used
+        :param out: one dimensional array of length size
+        :return out:
+        """
+        self.check(board)
+        # Building the row in a list and copying it once is much faster than writing numpy elements one by one.
+        row = [0] * self.size
+        hand = board.hands[player_num]
+        for side1, side2 in hand:
+            row[side1] += 1
+            row[side2] += 1
+        for train_num, train in enumerate(board.board):
+            header = train[0]
+            if header[1] == 'closed' and header[0] != player_num:
+                continue
+            row[self.trains_offset + train_num] = 1
+            if len(train) > 1:
+                row[self.ends_offset + train[-1][1]] += 1
+        if board.check_double('last'):
+            row[self.double_offset] = 1
+        row[self.hand_size_offset] = len(hand)
+        row[self.boneyard_offset] = len(board.boneyard)
+        out[:] = row
+        return out
+
+    def extract_batch(self, positions, out=None):
+        """
+        Writes the features of a sequence of positions into consecutive rows of out.
+        :param positions: sequence of (board, player_num) pairs
+        :param out: array with at least len(positions) rows, allocated if None
+        :return out:
+        """
+        if out is None:
+            out = self.allocate(len(positions))
+        elif len(out) < len(positions):
+            raise ValueError("Output array has %d rows for %d positions." % (len(out), len(positions)))
+        for row, (board, player_num) in enumerate(positions):
+            self.extract(board, player_num, out[row])
+        return out
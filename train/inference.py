@@ -0,0 +1,227 @@
+"""
+Tracks what one player can infer about the dominoes they cannot see.
+
+BeliefTracker listens to a board and keeps a table of probabilities: row h, column d is the chance that holder h (a
+player, or the boneyard in the last row) has domino d. Dominoes in the player's own hand or on the board have an empty
+column. Each event only touches what it changes:
+
+    draw by an opponent: a uniformly random domino moves from the boneyard row to the opponent's row
+    play: the domino's column is cleared and the rows are rebalanced
+    drawing, or ending a turn without playing or with a double nobody backed up: the player had nothing that fits any
+        train they were allowed to play on, so those entries are cleared (drawing may be given partial weight with
+        draw_evidence, since people may draw while holding a move)
+
+Rebalancing runs a few sweeps of iterative proportional fitting, started from the current table, so that rows add up
+to the number of dominoes each holder has and every unknown column adds up to one.
+
+sample() deals the unknown dominoes according to the table, for rollouts and for endgame search on inferred hands.
+InferenceEndgameAI is the EndgameAI for games of more than two players: it searches each endgame move on a deal sampled
+from its own tracker, so it never looks at the opponents' real hands.
+"""
+
+from __future__ import absolute_import
+
+__author__ = 'Vince'
+
+import numpy
+
+from train.endgame import EndgameAI
+from train.train import domino_set
+
+
+class BeliefTracker(object):
+    """
+    Probabilities of who holds each unseen domino, from the point of view of one player.
+    """
+
+    def __init__(self, board, player_num, sweeps=3, draw_evidence=0.0):
+        """
+        :param board: board to listen to
+        :param player_num: player whose point of view is used
+        :param sweeps: rebalancing sweeps after each event
+        :param draw_evidence: weight kept for dominoes that would have been playable when an opponent drew, 0 trusts
+        that players only draw when they cannot move, 1 ignores draws as evidence
+        """
+        self.board = board
+        self.player_num = player_num
+        self.sweeps = sweeps
+        self.draw_evidence = draw_evidence
+        self.dominoes = domino_set(board.max_domino)
+        self.ids = {}
+        for idx, domino in enumerate(self.dominoes):
+            self.ids[domino] = idx
+            self.ids[(domino[1], domino[0])] = idx
+        self.with_value = numpy.zeros((board.max_domino + 1, len(self.dominoes)), numpy.bool_)
+        for idx, (side1, side2) in enumerate(self.dominoes):
+            self.with_value[side1, idx] = True
+            self.with_value[side2, idx] = True
+        self.probabilities = numpy.zeros((board.num_players + 1, len(self.dominoes)))
+        self.played = False
+        self.reset()
+        board.listeners.append(self)
+
+    @property
+    def boneyard(self):
+        return self.board.num_players
+
+    def unseen(self):
+        """
+        Returns a mask of the dominoes that are neither in the player's hand nor on the board.
+        """
+        unseen = numpy.ones(len(self.dominoes), numpy.bool_)
+        for domino in self.board.hands[self.player_num]:
+            unseen[self.ids[domino]] = False
+        for train in self.board.board:
+            for domino in train[1:]:
+                unseen[self.ids[domino]] = False
+        return unseen
+
+    def reset(self):
+        """
+        Starts again from what can be seen on the board, with no evidence about any opponent.
+        :return:
+        """
+        self.probabilities[:] = self.unseen()
+        self.probabilities[self.player_num] = 0
+        self.balance()
+
+    def targets(self):
+        """
+        Returns the number of unseen dominoes each row should add up to.
+        """
+        counts = [len(hand) for hand in self.board.hands] + [len(self.board.boneyard)]
+        counts[self.player_num] = 0
+        return numpy.array(counts, numpy.float64)
+
+    def balance(self):
+        """
+        Rescales rows to the holders' domino counts and columns to one, a few times.
+        :return:
+        """
+        table = self.probabilities
+        targets = self.targets()
+        for sweep in range(self.sweeps):
+            rows = table.sum(axis=1)
+            table *= (numpy.divide(targets, rows, out=numpy.zeros_like(rows), where=rows > 0))[:, None]
+            columns = table.sum(axis=0)
+            table /= numpy.where(columns > 0, columns, 1)
+
+    def playable(self, player):
+        """
+        Returns a mask of the dominoes that would fit a train the player is allowed to play on now.
+        :param player:
+        :return:
+        """
+        board = self.board
+        if len(board.board[player]) <= 2:
+            trains = [player]
+        elif board.check_double('last'):
+            trains = [board.last_played[1]]
+        else:
+            trains = range(len(board.board))
+        mask = numpy.zeros(len(self.dominoes), numpy.bool_)
+        for train_num in trains:
+            train = board.board[train_num]
+            if len(train) < 2 or train[0][1] == 'closed' and train[0][0] != player:
+                continue
+            mask |= self.with_value[train[-1][1]]
+        return mask
+
+    def exclude(self, player, weight=0.0):
+        """
+        Records that a player holds nothing they could play right now.
+        :param player:
+        :param weight: factor applied to the matching entries, 0 to rule them out
+        :return:
+        """
+        self.probabilities[player, self.playable(player)] *= weight
+        self.balance()
+
+    def __call__(self, event, *args):
+        if event == 'new_game':
+            self.reset()
+        elif event == 'turn_start':
+            self.played = False
+        elif event == 'draw':
+            player, domino = args
+            column = self.ids[domino]
+            if player == self.player_num:
+                self.probabilities[:, column] = 0
+                self.balance()
+                return
+            self.probabilities[player, self.playable(player)] *= self.draw_evidence
+            # The domino came from the boneyard, which held one more domino before the draw.
+            before = len(self.board.boneyard) + 1
+            moved = self.probabilities[self.boneyard] / before
+            self.probabilities[player] += moved
+            self.probabilities[self.boneyard] -= moved
+            self.balance()
+        elif event == 'play':
+            self.played = True
+            player, domino = args[:2]
+            if player != self.player_num:
+                self.probabilities[:, self.ids[domino]] = 0
+                self.balance()
+        elif event == 'turn_end':
+            # The board is as the player left it, so playable() still gives the options they had.
+            if args[0] != self.player_num and (not self.played or self.board.check_double('last')):
+                self.exclude(args[0])
+
+    def probability(self, player, domino):
+        """
+        Returns the probability that a player (or the boneyard, player = num_players) holds a domino.
+        """
+        return self.probabilities[player, self.ids[domino]]
+
+    def sample(self, random_state=None, attempts=20):
+        """
+        Deals the unseen dominoes according to the table.
+        :param random_state: numpy.random.RandomState, defaults to the global one
+        :param attempts: deals tried before the evidence is ignored for a holder that cannot be filled
+        :return (hands, boneyard): hands has the player's own hand at their position
+        """
+        random_state = random_state or numpy.random
+        targets = self.targets().astype(int)
+        unseen = self.unseen()
+        for attempt in range(attempts + 1):
+            remaining = unseen.copy()
+            hands = []
+            for holder in range(self.board.num_players):
+                if holder == self.player_num:
+                    hands.append(list(self.board.hands[holder]))
+                    continue
+                if not targets[holder]:
+                    hands.append([])
+                    continue
+                weights = self.probabilities[holder] * remaining
+                if attempt == attempts:
+                    weights = weights + remaining * 1e-9
+                if numpy.count_nonzero(weights) < targets[holder]:
+                    break
+                chosen = random_state.choice(len(self.dominoes), targets[holder], replace=False,
+                                             p=weights / weights.sum())
+                remaining[chosen] = False
+                hands.append([self.dominoes[idx] for idx in chosen])
+            else:
+                return hands, [self.dominoes[idx] for idx in numpy.flatnonzero(remaining)]
+        raise ValueError("Unseen dominoes cannot be dealt to match the hand sizes.")
+
+
+class InferenceEndgameAI(EndgameAI):
+    """
+    EndgameAI that searches on hands sampled from a BeliefTracker, so endgames of more than two players are searched
+    without knowing how the opponents split the unseen dominoes.
+    """
+    __slots__ = ('beliefs', 'random_state')
+
+    def __init__(self, board, player_num):
+        EndgameAI.__init__(self, board, player_num)
+        self.beliefs = BeliefTracker(board, player_num)
+        # Seeded from the state of the board's generator without drawing from it, so seeded boards deal as usual and
+        # still sample the same hands every time.
+        self.random_state = numpy.random.RandomState((hash(board.random.getstate()) + player_num) & 0xffffffff)
+
+    def endgame_hands(self):
+        if self.board.boneyard:
+            return None
+        return self.beliefs.sample(self.random_state)[0]
@@ -0,0 +1,249 @@
+"""
+Saves and restores whole games so tables survive restarts and can move between machines.
+
+dumps/loads turn an Engine into a compact zlib compressed JSON document and back. Dominoes are stored as flat lists of
+pip values and players by the name of their class, which must be registered in PLAYER_TYPES. The random generator of
+seeded boards is not saved: the boneyard is already shuffled, so only the deal of later rounds differs.
+
+TableStore keeps one checkpoint file per table in a local directory and can save a table after every turn. Table ids
+are percent encoded into file names, so ids from outside can never name a file elsewhere.
+ShardRouter decides which worker node owns a table using rendezvous hashing, so adding or removing a node only moves
+the tables of that node.
+
+Usage:
+    store = TableStore('/var/lib/train/tables')
+    store.attach('table-17', engine)
+    engine.run_game()
+    ...
+    engine = store.load('table-17')  # on any node
+    engine.play_game()
+"""
+
+from __future__ import absolute_import
+
+__author__ = 'Vince'
+
+import hashlib
+import json
+import os
+import tempfile
+import urllib
+import zlib
+
+from train.train import AI, Engine, Player
+
+FORMAT_VERSION = 1
+
+PLAYER_TYPES = {
+    'Player': Player,
+    'AI': AI,
+}
+
+
+def register_player_type(player_type):
+    """
+    Allows games with players of this class to be saved and restored. Can be used as a class decorator.
+    :param player_type: Player subclass
+    :return player_type:
+    """
+    PLAYER_TYPES[player_type.__name__] = player_type
+    return player_type
+
+
+def flatten(dominoes):
+    return [side for domino in dominoes for side in domino]
+
+
+def pair(sides):
+    return [(sides[idx], sides[idx + 1]) for idx in range(0, len(sides), 2)]
+
+
+def header(values):
+    """
+    Returns a train header read back from JSON, with its names as str again.
+    :param values: [owner, 'open' or 'closed']
+    :return:
+    """
+    owner, state = values
+    if not isinstance(owner, int):
+        owner = str(owner)
+    return owner, str(state)
+
+
+def engine_state(engine):
+    """
+    Returns the state of an engine as a dictionary of JSON types.
+    :param engine:
+    :return:
+    """
+    board = engine.board
+    for player in engine.players:
+        if PLAYER_TYPES.get(type(player).__name__) is not type(player):
+            raise ValueError("Player type %s is not registered." % type(player).__name__)
+    return {
+        'version': FORMAT_VERSION,
+        'max_domino': board.max_domino,
+        'players': [type(player).__name__ for player in engine.players],
+        'started': [player.own_train_started for player in engine.players],
+        'scores': engine.scores,
+        'idle_turns': engine.idle_turns,
+        'playing': engine.playing,
+        'headers': [train[0] for train in board.board],
+        'trains': [flatten(train[1:]) for train in board.board],
+        'hands': [flatten(hand) for hand in board.hands],
+        'boneyard': flatten(board.boneyard),
+        'last_played': list(board.last_played[0]) + [board.last_played[1]],
+        'current_player': board.current_player,
+    }
+
+
+def restore_engine(state):
+    """
+    Builds an engine from the output of engine_state.
+    :param state:
+    :return:
+    """
+    if state['version'] != FORMAT_VERSION:
+        raise ValueError("Unsupported table format version %s." % state['version'])
+    try:
+        player_types = [PLAYER_TYPES[name] for name in state['players']]
+    except KeyError as error:
+        raise ValueError("Player type %s is not registered." % error.args[0])
+    engine = Engine(0, len(player_types), state['max_domino'])
+    board = engine.board
+    board.board = [[header(values)] + pair(train) for values, train in zip(state['headers'], state['trains'])]
+    board.hands = [pair(hand) for hand in state['hands']]
+    board.boneyard = pair(state['boneyard'])
+    side1, side2, train_num = state['last_played']
+    board.last_played = ((side1, side2), train_num)
+    board.current_player = state['current_player']
+    engine.seat_players(player_types)
+    for player, started in zip(engine.players, state['started']):
+        player.own_train_started = started
+    engine.scores = list(state['scores'])
+    engine.idle_turns = state['idle_turns']
+    engine.playing = state['playing']
+    return engine
+
+
+def dumps(engine):
+    """
+    Returns a compact byte string holding the full state of an engine.
+    :param engine:
+    :return:
+    """
+    return zlib.compress(json.dumps(engine_state(engine), separators=(',', ':')).encode('utf-8'))
+
+
+def loads(data):
+    """
+    Restores an engine saved with dumps.
+    :param data:
+    :return:
+    """
+    return restore_engine(json.loads(zlib.decompress(data).decode('utf-8')))
+
+
+class TableStore(object):
+    """
+    Checkpoints of tables in a local directory, one file per table id.
+    """
+
+    suffix = '.table'
+
+    def __init__(self, directory):
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def path(self, table_id):
+        return os.path.join(self.directory, urllib.quote(str(table_id), safe='') + self.suffix)
+
+    def save(self, table_id, engine):
+        """
+        Writes a checkpoint. The data is synced to disk before the file is replaced in one step, so neither a crash
+        nor a power loss leaves a half written table.
+        :param table_id:
+        :param engine:
+        :return:
+        """
+        data = dumps(engine)
+        handle, temp_path = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(handle, 'wb') as temp_file:
+                temp_file.write(data)
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+            os.rename(temp_path, self.path(table_id))
+        except Exception:
+            os.remove(temp_path)
+            raise
+        # Sync the directory too so that the rename itself survives a power loss.
+        directory = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+    def load(self, table_id):
+        with open(self.path(table_id), 'rb') as table_file:
+            return loads(table_file.read())
+
+    def delete(self, table_id):
+        os.remove(self.path(table_id))
+
+    def table_ids(self):
+        return sorted(urllib.unquote(name[:-len(self.suffix)]) for name in os.listdir(self.directory)
+                      if name.endswith(self.suffix))
+
+    def attach(self, table_id, engine):
+        """
+        Saves the table after every turn and at the end of every round.
+        :param table_id:
+        :param engine:
+        :return listener: remove it from engine.board.listeners to stop checkpointing
+        """
+        def checkpoint(event, *args):
+            if event in ('new_game', 'turn_end', 'game_over'):
+                self.save(table_id, engine)
+        engine.board.listeners.append(checkpoint)
+        return checkpoint
+
+
+class ShardRouter(object):
+    """
+    Assigns table ids to worker nodes with rendezvous (highest random weight) hashing.
+    """
+
+    def __init__(self, nodes):
+        self.nodes = list(nodes)
+
+    def add_node(self, node):
+        if node not in self.nodes:
+            self.nodes.append(node)
+
+    def remove_node(self, node):
+        self.nodes.remove(node)
+
+    @staticmethod
+    def weight(node, table_id):
+        return hashlib.md5(('%s/%s' % (node, table_id)).encode('utf-8')).hexdigest()
+
+    def node_for(self, table_id):
+        """
+        Returns the node that owns a table.
+        :param table_id:
+        :return:
+        """
+        if not self.nodes:
+            raise ValueError("No nodes to route to.")
+        return max(self.nodes, key=lambda node: self.weight(node, table_id))
+
+    def tables_for(self, node, table_ids):
+        """
+        Returns the table ids owned by a node.
+        :param node:
+        :param table_ids:
+        :return:
+        """
+        return [table_id for table_id in table_ids if self.node_for(table_id) == node]
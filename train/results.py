@@ -0,0 +1,218 @@
+"""
+Writes simulation results to disk as columnar NumPy .npz chunks.
+
+Each column lives in a preallocated array. When the arrays are full they are written to the next numbered chunk file
+(<prefix>-00000.npz, <prefix>-00001.npz, ...) and reused, so memory stays constant however many rounds are played.
+load_columns reads all chunks of a prefix back as one array per column. A writer refuses to start on a prefix that
+already has chunks, so the results of two runs are never mixed: write each run to its own directory.
+
+Usage:
+    record_games([AI, AI, AI, AI], range(100000), 'results')
+    rounds = load_columns('results/rounds')
+"""
+
+from __future__ import absolute_import
+
+__author__ = 'Vince'
+
+import glob
+import os
+from timeit import default_timer
+
+import numpy
+
+from train.train import Engine
+
+# Values of the 'action' column of the move records.
+PLAY = 0
+DRAW = 1
+
+ROUND_COLUMNS = [
+    ('seed', numpy.int64),
+    ('seat', numpy.int8),
+    ('winner', numpy.bool_),
+    ('turns', numpy.int32),
+    ('pips', numpy.int16),
+    ('doubles', numpy.int16),
+    ('draws', numpy.int16),
+]
+
+MOVE_COLUMNS = [
+    ('seed', numpy.int64),
+    ('turn', numpy.int32),
+    ('seat', numpy.int8),
+    ('action', numpy.int8),
+    ('side1', numpy.int8),
+    ('side2', numpy.int8),
+    ('train', numpy.int8),
+    ('seconds', numpy.float32),
+]
+
+
+class ChunkedWriter(object):
+    """
+    Buffers rows in one preallocated array per column and writes them out every chunk_size rows.
+    """
+
+    def __init__(self, prefix, columns, chunk_size=65536, compress=False):
+        """
+        :param prefix: path of the chunk files without the chunk number and extension
+        :param columns: list of (name, dtype) pairs, or (name, dtype, shape) for columns holding arrays
+        :param chunk_size: rows per chunk file
+        :param compress: use numpy.savez_compressed instead of numpy.savez
+        """
+        self.prefix = prefix
+        self.names = []
+        self.buffers = []
+        for column in columns:
+            shape = tuple(column[2]) if len(column) > 2 else ()
+            self.names.append(column[0])
+            self.buffers.append(numpy.empty((chunk_size,) + shape, column[1]))
+        self.chunk_size = chunk_size
+        self.compress = compress
+        self.rows = 0
+        self.chunks = 0
+        if chunk_paths(prefix):
+            raise IOError("Result chunks already exist for %s" % prefix)
+        directory = os.path.dirname(prefix)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def append(self, *row):
+        """
+        Adds a row. Values are given in column order.
+        :param row:
+        :return:
+        """
+        for buf, value in zip(self.buffers, row):
+            buf[self.rows] = value
+        self.rows += 1
+        if self.rows == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered rows to the next chunk file. Does nothing if no rows are buffered.
+        :return:
+        """
+        if not self.rows:
+            return
+        path = "%s-%05d.npz" % (self.prefix, self.chunks)
+        save = numpy.savez_compressed if self.compress else numpy.savez
+        save(path, **dict((name, buf[:self.rows]) for name, buf in zip(self.names, self.buffers)))
+        self.chunks += 1
+        self.rows = 0
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def chunk_paths(prefix):
+    """
+    Returns the paths of the chunks written with the given prefix, in order.
+    :param prefix:
+    :return:
+    """
+    return sorted(glob.glob(prefix + "-[0-9][0-9][0-9][0-9][0-9].npz"))
+
+
+def load_columns(prefix):
+    """
+    Reads every chunk written with the given prefix and returns a dictionary of column name to array.
+    :param prefix:
+    :return:
+    """
+    paths = chunk_paths(prefix)
+    if not paths:
+        raise IOError("No result chunks found for %s" % prefix)
+    chunks = []
+    for path in paths:
+        with numpy.load(path) as data:
+            chunks.append(dict((name, data[name]) for name in data.files))
+    return dict((name, numpy.concatenate([chunk[name] for chunk in chunks])) for name in chunks[0])
+
+
+class ResultsRecorder(object):
+    """
+    Board listener that writes one row per seat for every round and one row per draw or play.
+    """
+
+    def __init__(self, directory, chunk_size=65536, compress=False):
+        self.rounds = ChunkedWriter(os.path.join(directory, 'rounds'), ROUND_COLUMNS, chunk_size, compress)
+        self.moves = ChunkedWriter(os.path.join(directory, 'moves'), MOVE_COLUMNS, chunk_size, compress)
+        self.board = None
+        self.seed = -1
+        self.turns = 0
+        self.doubles = []
+        self.draws = []
+        self.last_event = 0.0
+
+    def attach(self, engine, seed):
+        """
+        Records the next round played by the engine under the given seed.
+        :param engine:
+        :param seed:
+        :return:
+        """
+        if self.board is not None:
+            self.board.listeners.remove(self)
+        self.board = engine.board
+        self.board.listeners.append(self)
+        self.seed = seed
+
+    def __call__(self, event, *args):
+        if event == 'new_game':
+            self.turns = 0
+            self.doubles = [0] * self.board.num_players
+            self.draws = [0] * self.board.num_players
+        elif event == 'turn_start':
+            self.turns += 1
+            self.last_event = default_timer()
+        elif event == 'draw':
+            self.record_move(DRAW, args[0], args[1], -1)
+            self.draws[args[0]] += 1
+        elif event == 'play':
+            self.record_move(PLAY, args[0], args[1], args[2])
+            if args[1][0] == args[1][1]:
+                self.doubles[args[0]] += 1
+        elif event == 'game_over':
+            for seat in range(self.board.num_players):
+                self.rounds.append(self.seed, seat, seat == args[0], self.turns, self.board.pip_count(seat),
+                                   self.doubles[seat], self.draws[seat])
+
+    def record_move(self, action, seat, domino, train_num):
+        now = default_timer()
+        self.moves.append(self.seed, self.turns, seat, action, domino[0], domino[1], train_num, now - self.last_event)
+        self.last_event = now
+
+    def close(self):
+        self.rounds.close()
+        self.moves.close()
+
+
+def record_games(player_types, seeds, directory, max_domino=12, chunk_size=65536, compress=False):
+    """
+    Plays one round per seed with the given player classes and writes the results to directory.
+    :param player_types: list of AI subclasses, one per seat
+    :param seeds: iterable of seeds
+    :param directory:
+    :param max_domino:
+    :param chunk_size: rows per chunk file
+    :param compress:
+    :return:
+    """
+    recorder = ResultsRecorder(directory, chunk_size, compress)
+    try:
+        for seed in seeds:
+            engine = Engine(0, len(player_types), max_domino, seed)
+            engine.seat_players(player_types)
+            recorder.attach(engine, seed)
+            engine.run_game()
+    finally:
+        recorder.close()
@@ -0,0 +1,280 @@
+"""
+Generates training data for value and policy models from computer self-play.
+
+Every decision a RecordingAI makes during its turns is stored as one record: the features of the position (see
+train.features), a mask of the legal actions, the action chosen and, once the round is over, whether the acting seat
+won and how many pips it was left with. Plays on the first turn of each player are made as one chain by
+AI.play_first_move and are not recorded.
+
+Games are played in worker processes, each handling every n-th seed. Finished games are sent to the parent through a
+bounded queue so that workers wait instead of piling up results whenever writing falls behind, and the parent
+appends them to .npz shards through a ChunkedWriter. While waiting the parent checks that its workers are still
+running, so a worker killed by the system fails the run instead of leaving it waiting forever.
+
+Usage:
+    generate('data', 100000)
+    records = load_columns('data/selfplay')
+"""
+
+from __future__ import absolute_import
+
+__author__ = 'Vince'
+
+import multiprocessing
+import os
+import Queue
+import traceback
+
+import numpy
+
+from train.features import FeatureExtractor
+from train.results import ChunkedWriter
+from train.train import AI, Engine, domino_set
+
+
+class ActionSpace(object):
+    """
+    Numbers every possible action: one per (train, domino) pair, then drawing and passing.
+    """
+
+    def __init__(self, num_players, max_domino=12):
+        self.dominoes = domino_set(max_domino)
+        self.domino_ids = dict((domino, idx) for idx, domino in enumerate(self.dominoes))
+        self.draw_action = (num_players + 1) * len(self.dominoes)
+        self.pass_action = self.draw_action + 1
+        self.size = self.pass_action + 1
+
+    def encode(self, player, move):
+        """
+        Returns the number of a move as returned by Player.choose_move.
+        :param player:
+        :param move: 'draw', 'pass' or (domino_idx, train_num)
+        :return:
+        """
+        if move == 'draw':
+            return self.draw_action
+        elif move == 'pass':
+            return self.pass_action
+        domino_idx, train_num = move
+        return train_num * len(self.dominoes) + self.domino_ids[player.hand[domino_idx]]
+
+    def decode(self, player, action):
+        """
+        Returns the move for an action number, the inverse of encode.
+        :param player:
+        :param action:
+        :return:
+        """
+        if action == self.draw_action:
+            return 'draw'
+        elif action == self.pass_action:
+            return 'pass'
+        train_num, domino_id = divmod(action, len(self.dominoes))
+        return player.hand.index(self.dominoes[domino_id]), train_num
+
+    def legal(self, player, drawn):
+        """
+        Returns the numbers of the actions an AI may take. Drawing is allowed while the boneyard has dominoes and the
+        player has not drawn this turn, passing only when nothing else is.
+        :param player:
+        :param drawn: boolean indicating if draw has already been done on turn
+        :return:
+        """
+        actions = []
+        for train_num, dominoes in enumerate(player.get_moves()):
+            for domino_idx in dominoes:
+                actions.append(self.encode(player, (domino_idx, train_num)))
+        if not drawn and player.board.boneyard:
+            actions.append(self.draw_action)
+        elif not actions:
+            actions.append(self.pass_action)
+        return actions
+
+
+class GameRecorder(object):
+    """
+    Collects the decisions of one round. The feature buffer grows as needed and is reused for the next round.
+    """
+
+    def __init__(self, num_players, max_domino=12):
+        self.extractor = FeatureExtractor(num_players, max_domino)
+        self.actions = ActionSpace(num_players, max_domino)
+        self.features = self.extractor.allocate(256)
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.legal = []
+        self.chosen = []
+        self.seats = []
+
+    def record(self, player, drawn, move):
+        if self.count == len(self.features):
+            self.features = numpy.concatenate([self.features, self.extractor.allocate(len(self.features))])
+        self.extractor.extract(player.board, player.player_num, self.features[self.count])
+        self.legal.append(self.actions.legal(player, drawn))
+        self.chosen.append(self.actions.encode(player, move))
+        self.seats.append(player.player_num)
+        self.count += 1
+
+    def finish(self, seed, winner, pips):
+        """
+        Returns the records of the round as a dictionary of arrays and gets ready for the next round.
+        :param seed:
+        :param winner:
+        :param pips: pips left per seat
+        :return:
+        """
+        legal = numpy.zeros((self.count, self.actions.size), numpy.bool_)
+        for row, actions in enumerate(self.legal):
+            legal[row, actions] = True
+        seats = numpy.array(self.seats, numpy.int8)
+        records = {
+            'seed': numpy.repeat(numpy.int64(seed), self.count),
+            'seat': seats,
+            'features': self.features[:self.count].copy(),
+            'legal': legal,
+            'action': numpy.array(self.chosen, numpy.int16),
+            'won': seats == winner,
+            'pips': numpy.array(pips, numpy.int16)[seats],
+        }
+        self.reset()
+        return records
+
+
+class RecordingAI(AI):
+    """
+    AI that reports every decision to a GameRecorder. Strategies to record subclass it and override select_move.
+    """
+    recorder = None
+
+    def choose_move(self, drawn):
+        move = AI.choose_move(self, drawn)
+        if self.recorder is not None:
+            self.recorder.record(self, drawn, move)
+        return move
+
+
+def columns(num_players, max_domino=12):
+    """
+    Returns the ChunkedWriter columns of the self-play records.
+    :param num_players:
+    :param max_domino:
+    :return:
+    """
+    return [
+        ('seed', numpy.int64),
+        ('seat', numpy.int8),
+        ('features', numpy.float32, (FeatureExtractor(num_players, max_domino).size,)),
+        ('legal', numpy.bool_, (ActionSpace(num_players, max_domino).size,)),
+        ('action', numpy.int16),
+        ('won', numpy.bool_),
+        ('pips', numpy.int16),
+    ]
+
+
+def play_games(seeds, num_players=4, max_domino=12, player_type=RecordingAI):
+    """
+    Plays one self-play round per seed and yields its records.
+    :param seeds: iterable of seeds
+    :param num_players:
+    :param max_domino:
+    :param player_type: RecordingAI subclass seated in every seat
+    :return:
+    """
+    recorder = GameRecorder(num_players, max_domino)
+    for seed in seeds:
+        engine = Engine(0, num_players, max_domino, seed)
+        engine.seat_players([player_type] * num_players)
+        for player in engine.players:
+            player.recorder = recorder
+        winner = engine.run_game()
+        yield recorder.finish(seed, winner, engine.scores)
+
+
+def worker(queue, seeds, num_players, max_domino, player_type):
+    """
+    Process target. Puts the records of every game on the queue, then None. Errors are sent as a string.
+    """
+    try:
+        for records in play_games(seeds, num_players, max_domino, player_type):
+            queue.put(records)
+    except Exception:
+        queue.put(traceback.format_exc())
+    queue.put(None)
+
+
+def generate(directory, num_games, num_players=4, max_domino=12, player_type=RecordingAI, workers=None,
+             shard_size=65536, queue_size=32, first_seed=0, compress=False, poll_seconds=1.0):
+    """
+    Plays num_games self-play rounds and writes their records to <directory>/selfplay-NNNNN.npz shards. Raises IOError
+    if the directory already holds self-play shards.
+    :param directory:
+    :param num_games:
+    :param num_players:
+    :param max_domino:
+    :param player_type: RecordingAI subclass seated in every seat
+    :param workers: number of worker processes, defaults to the number of CPUs, 0 plays in this process
+    :param shard_size: records per shard
+    :param queue_size: games that may wait to be written before workers block
+    :param first_seed: seed of the first game, later games use the following seeds
+    :param compress:
+    :param poll_seconds: time waited for results before checking that the workers are alive
+    :return number of records written:
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    seeds = range(first_seed, first_seed + num_games)
+    writer = ChunkedWriter(os.path.join(directory, 'selfplay'), columns(num_players, max_domino), shard_size,
+                           compress)
+    written = 0
+    try:
+        if workers == 0:
+            for records in play_games(seeds, num_players, max_domino, player_type):
+                written += write_records(writer, records)
+            return written
+        queue = multiprocessing.Queue(queue_size)
+        processes = [multiprocessing.Process(target=worker,
+                                             args=(queue, seeds[idx::workers], num_players, max_domino, player_type))
+                     for idx in range(workers)]
+        for process in processes:
+            process.daemon = True
+            process.start()
+        running = workers
+        while running:
+            try:
+                records = queue.get(timeout=poll_seconds)
+            except Queue.Empty:
+                failed = [process.exitcode for process in processes if process.exitcode not in (None, 0)]
+                if failed:
+                    for process in processes:
+                        process.terminate()
+                    raise RuntimeError("Self-play worker exited with code %s before finishing." % failed[0])
+                if any(process.is_alive() for process in processes):
+                    continue
+                # The last records may have been sent after the wait gave up. Workers flush the queue before they
+                # exit, so once all have exited anything they sent can be read without waiting.
+                try:
+                    records = queue.get_nowait()
+                except Queue.Empty:
+                    raise RuntimeError("Self-play worker exited before finishing.")
+            if records is None:
+                running -= 1
+            elif isinstance(records, str):
+                for process in processes:
+                    process.terminate()
+                raise RuntimeError("Self-play worker failed:\n" + records)
+            else:
+                written += write_records(writer, records)
+        for process in processes:
+            process.join()
+        return written
+    finally:
+        writer.close()
+
+
+def write_records(writer, records):
+    names = writer.names
+    for row in range(len(records['seed'])):
+        writer.append(*[records[name][row] for name in names])
+    return len(records['seed'])
@@ -52,24 +52,64 @@ GUI:
 
 __author__ = 'Vince'
 
-from copy import copy
 import random
 
+# Starting hand size for a standard double-12 set, by number of players.
+HAND_SIZES = {
+    2: 12,
+    3: 12,
+    4: 12,
+    5: 11,
+    6: 11,
+    7: 10,
+    8: 10
+}
+
+# Deals tried before giving up on finding a double in anybody's hand.
+MAX_DEALS = 100
+
+_domino_sets = {}
+# Maps both orientations of every domino in the sets built so far to the other orientation.
+_flipped = {}
+
+
+def domino_set(max_domino):
+    """
+    Returns every domino of a set as a tuple of (low, high) tuples. Sets are built once per max_domino and shared, so
+    they must not be modified.
+    :param max_domino:
+    :return:
+    """
+    try:
+        return _domino_sets[max_domino]
+    except KeyError:
+        dominoes = tuple((side1, side2) for side1 in range(max_domino + 1) for side2 in range(side1, max_domino + 1))
+        for domino in dominoes:
+            flipped = (domino[1], domino[0])
+            _flipped.setdefault(domino, flipped)
+            _flipped.setdefault(flipped, domino)
+        return _domino_sets.setdefault(max_domino, dominoes)
+
 
 class Board(object):
     """
     Contains all methods needed to set up and store a game board. Board is represented by list of lists
     """
+    __slots__ = ('num_players', 'max_domino', 'random', 'boneyard', 'domino_set', 'board', 'hands', 'last_played',
+                 'current_player', 'listeners')
 
-    def __init__(self, num_players, max_domino=12):
+    def __init__(self, num_players, max_domino=12, seed=None):
         self.num_players = num_players
         self.max_domino = max_domino
+        # Seeding a new generator from the OS is slow, so unseeded boards share the module's generator.
+        self.random = random if seed is None else random.Random(seed)
         self.boneyard = []
-        self.domino_set = []
+        self.domino_set = ()
         self.board = []
         self.hands = [[] for x in range(num_players)]
         self.last_played = ((-2, -1), -1)  # Once any player moves, will be a tuple of the form ((0,0), train_number)
         self.current_player = 0
+        self.listeners = []
         self.make_dom_set()
 
     def __str__(self):
@@ -103,12 +143,9 @@ class Board(object):
 
     def make_dom_set(self):
         """
-        Creates a set of dominoes.
+        Creates a set of dominoes. The set is a shared tuple, copy it before changing it.
         """
-        self.domino_set = []
-        for side1 in range(self.max_domino + 1):
-            for side2 in range(side1, self.max_domino + 1):
-                self.domino_set.append((side1, side2))
+        self.domino_set = domino_set(self.max_domino)
 
     def empty_hands(self):
         self.hands = [[] for x in range(self.num_players)]
@@ -118,18 +155,8 @@ class Board(object):
         Gets the appropriate size for the beginning hand.
         :return hand_size:
         """
-        # Dictionary for standard double-12 set.
-        hand_size = {
-            2: 12,
-            3: 12,
-            4: 12,
-            5: 11,
-            6: 11,
-            7: 10,
-            8: 10
-        }
-        if self.max_domino == 12 and self.num_players <= 8:
-            return hand_size[self.num_players]
+        if self.max_domino == 12 and self.num_players in HAND_SIZES:
+            return HAND_SIZES[self.num_players]
         # An ok made-up approximation of a good hand size.
         else:
             return int(len(self.domino_set) / 1.5 / self.num_players)
@@ -143,7 +170,7 @@ class Board(object):
             self.make_dom_set()
         for hand in self.hands:
             del hand[:]
-        self.boneyard = copy(self.domino_set)
+        self.boneyard = list(self.domino_set)
         self.shuffle_boneyard()
         hand_size = self.get_hand_size()
         num_to_deal = self.num_players * hand_size
@@ -167,9 +194,9 @@ class Board(object):
 
     def shuffle_boneyard(self):
         """
-        Shuffles the boneyard.
+        Shuffles the boneyard using the board's own random generator so that seeded boards deal identically.
         """
-        random.shuffle(self.boneyard)
+        self.random.shuffle(self.boneyard)
 
     def check_double(self, domino):
         """
@@ -190,14 +217,16 @@ class Board(object):
         Returns the player and the domino to be played.
         """
         first_player = 0
-        max_double = (0, 0)
+        max_double = None
         for player, hand in enumerate(self.hands):
             if not hand:
                 raise SetupError
             for domino in hand:
-                if self.check_double(domino) and domino[0] > max_double[0]:
+                if self.check_double(domino) and (max_double is None or domino[0] > max_double[0]):
                     max_double = domino
                     first_player = player
+        if max_double is None:
+            raise SetupError
         return first_player, max_double
 
     def next_player(self):
@@ -205,7 +234,7 @@ class Board(object):
         Sets self.current_player = to the next player in the queue
         :return:
         """
-        if self.current_player + 1 in range(self.num_players):
+        if self.current_player + 1 < self.num_players:
             self.current_player += 1
         else:
             self.current_player = 0
@@ -224,7 +253,11 @@ class Board(object):
         elif domino[0] == train[-1][1]:
             return domino  # Return the domino if it's already in correct orientation
         elif domino[1] == train[-1][1]:
-            return domino[1], domino[0]  # Flip domino if it creates valid move
+            # Flip domino if it creates valid move. Flipped dominoes come from a table to avoid building a new tuple.
+            try:
+                return _flipped[domino]
+            except KeyError:
+                return domino[1], domino[0]
         else:
             return False
 
@@ -241,8 +274,16 @@ class Board(object):
             self.max_domino = max_domino
             self.make_dom_set()
         self.create_board()
-        self.boneyard = copy(self.domino_set)
-        self.deal()
+        self.last_played = ((-2, -1), -1)
+        if self.get_hand_size() < 1:
+            raise SetupError
+        # Nobody can start without a double, so deal again until somebody holds one.
+        for attempt in range(MAX_DEALS):
+            self.deal()
+            if any(self.check_double(domino) for hand in self.hands for domino in hand):
+                break
+        else:
+            raise SetupError
         self.first_move()
 
     def first_move(self):
@@ -256,17 +297,42 @@ class Board(object):
             train.append(domino)
         self.hands[self.current_player].remove(domino)
 
+    def notify(self, event, *args):
+        """
+        Calls every listener with the name of a game event and its arguments. Events are 'new_game', 'turn_start'
+        (player), 'draw' (player, domino), 'play' (player, domino, train_num), 'turn_end' (player) and 'game_over'
+        (winner).
+        :param event:
+        :param args:
+        :return:
+        """
+        for listener in self.listeners:
+            listener(event, *args)
+
+    def pip_count(self, player):
+        """
+        Returns the total number of pips left in a player's hand.
+        :param player:
+        :return:
+        """
+        return sum(side1 + side2 for side1, side2 in self.hands[player])
+
 
 class Player(object):
     """
 
     """
+    __slots__ = ('board', 'player_num', 'hand', 'own_train_started', 'open_header', 'closed_header', 'moves')
 
     def __init__(self, board, player_num):
         self.board = board
         self.player_num = player_num
         self.hand = self.board.hands[self.player_num]
         self.own_train_started = False
+        # Train headers and the get_moves buffer are made once and reused on every move.
+        self.open_header = (player_num, 'open')
+        self.closed_header = (player_num, 'closed')
+        self.moves = []
 
     def __str__(self):
         """
@@ -288,35 +354,45 @@ class Player(object):
 
     def get_moves(self):
         """
-        Gets a list of lists of valid moves indexed by train number, domino number.
+        Gets a list of lists of valid moves indexed by train number, domino number. The lists are reused, so the
+        result is only valid until the next call.
         :return:
         """
-        blank_moves = []
-        moves = []
-        for player in range(self.board.num_players + 1):
-            blank_moves.append([])
-            moves.append([])
+        moves = self.moves
+        if len(moves) != self.board.num_players + 1:
+            moves[:] = [[] for x in range(self.board.num_players + 1)]
+        else:
+            for train_moves in moves:
+                del train_moves[:]
         # First check for mandatory moves, such as backing up double or playing the first turn
         if self.board.check_double(self.board.last_played[0]):
-            for idx, domino in enumerate(self.hand):
-                if self.board.check_move(domino, self.board.last_played[1], self.player_num):
-                    moves[self.board.last_played[1]].append(idx)
-            return moves
+            self.train_moves(self.board.last_played[1], moves[self.board.last_played[1]])
         elif not self.own_train_started:
-            for idx, domino in enumerate(self.hand):
-                if self.board.check_move(domino, self.player_num, self.player_num):
-                    moves[self.player_num].append(idx)
-            return moves[self.player_num]
+            self.train_moves(self.player_num, moves[self.player_num])
         # Then check for valid moves on open trains or player's train.
         else:
-            for train_idx, train in enumerate(self.board.board):
-                for dom_idx, domino in enumerate(self.hand):
-                    if self.board.check_move(domino, train_idx, self.player_num):
-                        moves[train_idx].append(dom_idx)
-        if moves == blank_moves:
+            for train_idx, train_moves in enumerate(moves):
+                self.train_moves(train_idx, train_moves)
+        if not any(moves):
             return []
         return moves
 
+    def train_moves(self, train_num, out):
+        """
+        Appends the index of every domino in the hand that can be played on a train to out. Same rules as
+        Board.check_move, with the train checks done once instead of once per domino.
+        :param train_num:
+        :param out:
+        :return:
+        """
+        train = self.board.board[train_num]
+        if train[0][0] != self.player_num and train[0][1] == 'closed':
+            return
+        end = train[-1][1]
+        for idx, domino in enumerate(self.hand):
+            if domino[0] == end or domino[1] == end:
+                out.append(idx)
+
     def print_moves(self, moves):
         """
         Takes a list of moves and prints it for the player
@@ -391,14 +467,39 @@ or 'back' to select a different train. >  ".format(action, action))
         if valid_move:
             self.board.board[train_num].append(valid_move)
             if train_num == self.player_num:
-                self.board.board[train_num][0] = (self.player_num, 'closed')
-            else:
-                self.board.board[train_num][0] = (self.player_num, 'open')
+                self.board.board[train_num][0] = self.closed_header
             self.board.last_played = (valid_move, train_num)
             self.hand.remove(domino)
+            self.board.notify('play', self.player_num, valid_move, train_num)
         else:
             return "Invalid move."
 
+    def draw(self):
+        """
+        Draws a domino from the boneyard into the player's hand. Returns None if the boneyard is empty.
+        :return domino:
+        """
+        domino = self.board.draw()
+        if domino is not None:
+            self.hand.append(domino)
+            self.board.notify('draw', self.player_num, domino)
+        return domino
+
+    def show_draw(self, domino, moves):
+        """
+        Tells the player which domino was drawn during a turn and whether it gave them a move.
+        :param domino: domino drawn, None if the boneyard was empty
+        :param moves: output of get_moves after the draw
+        :return:
+        """
+        if domino is None:
+            print "\nThe boneyard is empty."
+        else:
+            print "\nYou drew", domino
+        if not moves:
+            print "You have no available moves."
+        raw_input("Press enter to continue.")
+
     def play_first_move(self):
         """
         Handles the first move of a player.
@@ -416,11 +517,11 @@ or 'back' to select a different train. >  ".format(action, action))
                 print self
                 print "You have no moves available."
                 raw_input("Press enter to draw.")
-                self.hand.append(self.board.draw())
+                domino = self.draw()
                 actions_available['draw'] = False
                 actions_available['end'] = True
                 moves = self.get_moves()
-                print "You drew {}.".format(self.hand[-1])
+                print "You drew {}.".format(domino)
                 if not moves:
                     raw_input("You still have no moves available.\nPress enter to end your turn.")
                     return 'end'
@@ -435,7 +536,7 @@ or 'back' to select a different train. >  ".format(action, action))
             print self.board
             print self
             if moves:
-                print "Valid dominoes:", moves
+                print "Valid dominoes:", moves[self.player_num]
                 choice = raw_input("Choose a domino to play or type {0} to {0}. > "
                                    .format([k for (k, v) in actions_available.items() if v is True]))
                 return choice.lower()
@@ -457,8 +558,7 @@ or 'back' to select a different train. >  ".format(action, action))
             elif choice == 'draw':
                 actions_available['draw'] = False
                 actions_available['end'] = True
-                self.hand.append(self.board.draw())
-                print "You drew {}.".format(self.hand[-1])
+                print "You drew {}.".format(self.draw())
                 return 'success'
             return placement_choice(choice, moves)
 
@@ -469,7 +569,7 @@ or 'back' to select a different train. >  ".format(action, action))
                     raise IndexError
             except (ValueError, TypeError, IndexError):
                 return 'invalid'
-            if choice not in moves:
+            if not moves or choice not in moves[self.player_num]:
                 return 'invalid'
             self.play(choice, self.player_num)
             actions_available['played'] += 1
@@ -494,18 +594,116 @@ or 'back' to select a different train. >  ".format(action, action))
 
 
 class AI(Player):
-    pass
+    """
+    Computer player. Never asks for input; subclasses change the strategy by overriding select_move.
+    """
+    __slots__ = ()
+    search_limit = 2000
+
+    def choose_move(self, drawn):
+        """
+        Returns the move chosen by select_move, otherwise 'draw' while the boneyard has dominoes left and 'pass' once
+        it does not (or a draw has already been made this turn).
+        :param drawn: boolean indicating if draw has already been done on turn
+        :return:
+        """
+        moves = self.get_moves()
+        if moves:
+            return self.select_move(moves)
+        if drawn or not self.board.boneyard:
+            return 'pass'
+        return 'draw'
+
+    def select_move(self, moves):
+        """
+        Picks one move out of the output of get_moves. Always plays on its own train if it can, then prefers a double
+        that can be backed up and finally the domino with the most pips.
+        :param moves: list of lists of domino indices indexed by train number
+        :return (domino_idx, train_num):
+        """
+        if moves[self.player_num]:
+            first, last = self.player_num, self.player_num + 1
+        else:
+            first, last = 0, len(moves)
+        best = None
+        best_rank = None
+        for train_num in xrange(first, last):
+            for dom_idx in moves[train_num]:
+                move = dom_idx, train_num
+                rank = self.rank_move(move)
+                if best is None or rank > best_rank:
+                    best, best_rank = move, rank
+        return best
+
+    def rank_move(self, move):
+        """
+        Sort key used by select_move. Higher is better.
+        :param move: (domino_idx, train_num)
+        :return:
+        """
+        domino = self.hand[move[0]]
+        backed = False
+        if self.board.check_double(domino):
+            backed = any(domino[0] in other for idx, other in enumerate(self.hand) if idx != move[0])
+        return backed, domino[0] + domino[1]
+
+    def longest_train(self):
+        """
+        Finds the longest chain of dominoes from the hand that can be played on the player's own train. The search
+        stops after search_limit positions and returns the longest chain found so far.
+        :return list of dominoes in playing order:
+        """
+        end = self.board.board[self.player_num][-1][1]
+        return self.extend_train(end, list(self.hand), [self.search_limit])
+
+    def extend_train(self, end, available, budget):
+        """
+        Depth first search used by longest_train.
+        :param end: value the chain has to start from
+        :param available: dominoes that may be used
+        :param budget: single item list holding the number of positions left to search
+        :return:
+        """
+        best = []
+        for idx, domino in enumerate(available):
+            if end not in domino or budget[0] <= 0:
+                continue
+            budget[0] -= 1
+            next_end = domino[1] if domino[0] == end else domino[0]
+            chain = [domino] + self.extend_train(next_end, available[:idx] + available[idx + 1:], budget)
+            if len(chain) > len(best):
+                best = chain
+        return best
+
+    def show_draw(self, domino, moves):
+        pass
+
+    def play_first_move(self):
+        """
+        Plays the longest train possible on the first move, drawing once if nothing can be played.
+        :return:
+        """
+        chain = self.longest_train()
+        if not chain and self.draw() is not None:
+            chain = self.longest_train()
+        for domino in chain:
+            self.play(self.hand.index(domino), self.player_num)
+        if chain:
+            self.own_train_started = True
 
 
 class Engine(object):
     """
     Runs the game using player and board objects
     """
+    __slots__ = ('board', 'players', 'scores', 'idle_turns', 'playing')
 
-    def __init__(self, human_players, ai_players, max_domino=12):
-        self.board = Board(human_players + ai_players, max_domino)
+    def __init__(self, human_players, ai_players, max_domino=12, seed=None):
+        self.board = Board(human_players + ai_players, max_domino, seed)
         self.players = []
         self.scores = []
+        self.idle_turns = 0  # Turns in a row in which nothing was drawn or played
+        self.playing = False
         self.player_setup(human_players, ai_players)
 
     def player_setup(self, human_players, ai_players):
@@ -517,17 +715,29 @@ class Engine(object):
         """
         player_list = []
         for human in range(human_players):
-            player_list.append('human')
+            player_list.append(Player)
         for ai in range(ai_players):
-            player_list.append('ai')
-        while player_list:
-            next_to_add = player_list.pop(random.randrange(len(player_list)))
-            if next_to_add == 'ai':
-                self.players.append(AI(self.board, len(self.players)))
-            else:
-                self.players.append(Player(self.board, len(self.players)))
-        for player in self.players:
-            self.scores.append(0)
+            player_list.append(AI)
+        player_types = []
+        # Seats only differ when there are both kinds of players. Skipping the shuffle otherwise keeps the board's
+        # random numbers for the deal, so seeded computer-only games deal the same as boards with that seed.
+        if human_players and ai_players:
+            while player_list:
+                player_types.append(player_list.pop(self.board.random.randrange(len(player_list))))
+        else:
+            player_types = player_list
+        self.seat_players(player_types)
+
+    def seat_players(self, player_types):
+        """
+        Replaces the players with one instance of each given class, seated in the given order.
+        :param player_types: list of Player subclasses, one per seat
+        :return:
+        """
+        if len(player_types) != self.board.num_players:
+            raise SetupError
+        self.players = [player_type(self.board, seat) for seat, player_type in enumerate(player_types)]
+        self.scores = [0 for player in self.players]
 
     def game_over(self):
         """
@@ -542,18 +752,91 @@ class Engine(object):
                 return player
         return False
 
+    def blocked_winner(self):
+        """
+        Returns the player with the fewest pips left. Used when nobody can move and the boneyard is empty.
+        :return:
+        """
+        return min(range(self.board.num_players), key=self.board.pip_count)
+
     def run_game(self):
         """
-        Runs the round until a player wins.
+        Runs the round until a player wins or the game is blocked, adds the pips left in each hand to that player's
+        score and returns the winner.
+        :return:
+        """
+        self.start_game()
+        return self.play_game()
+
+    def start_game(self):
+        """
+        Deals a new round and resets the players.
         :return:
         """
         self.board.new_game()
+        for player in self.players:
+            player.update_hand()
+            player.own_train_started = False
+        self.idle_turns = 0
+        self.playing = True
+        self.board.notify('new_game')
+
+    def play_game(self):
+        """
+        Plays the current round to the end, scores it and returns the winner. Also used to continue a round restored
+        from a checkpoint.
+        :return:
+        """
+        if not self.playing:
+            raise SetupError
+        winner = self.round_winner()
+        while winner is False:
+            winner = self.play_turn()
+        for player in range(self.board.num_players):
+            self.scores[player] += self.board.pip_count(player)
+        self.playing = False
+        self.board.notify('game_over', winner)
+        return winner
+
+    def play_turn(self):
+        """
+        Plays the current player's turn and moves on to the next player. Returns the winner if the turn ended the
+        round, False otherwise.
+        :return:
+        """
+        progress = self.progress()
+        current_player = self.players[self.board.current_player]
+        self.board.notify('turn_start', current_player.player_num)
+        self.turn(current_player)
+        if progress == self.progress():
+            self.idle_turns += 1
+        else:
+            self.idle_turns = 0
+        self.board.next_player()
+        self.board.notify('turn_end', current_player.player_num)
+        return self.round_winner()
+
+    def round_winner(self):
+        """
+        Returns the winner of the round, the player with the fewest pips if nobody has been able to move for a full
+        round, or False if the round goes on.
+        :return:
+        """
         winner = self.game_over()
-        while not winner:
-            current_player = self.players[self.board.current_player]
-            self.turn(current_player)
-            winner = self.game_over()
-            self.board.next_player()
+        if winner is False and self.idle_turns >= self.board.num_players:
+            return self.blocked_winner()
+        return winner
+
+    def progress(self):
+        """
+        Returns a value that changes whenever a domino is drawn or played. Used to detect a blocked game.
+        :return:
+        """
+        # Drawing shrinks the boneyard and playing grows the board, so the difference changes with every action.
+        total = len(self.board.boneyard)
+        for train in self.board.board:
+            total -= len(train)
+        return total
 
     def turn(self, current_player):
         """
@@ -564,8 +847,7 @@ class Engine(object):
         if not current_player.own_train_started:
             current_player.play_first_move()
             return
-        self.board.board[current_player.player_num][0] = \
-            (current_player.player_num, 'open')
+        self.board.board[current_player.player_num][0] = current_player.open_header
         drawn = False
         while True:
             move = current_player.choose_move(drawn)
@@ -573,13 +855,11 @@ class Engine(object):
                 continue
             elif move == 'draw':
                 drawn = True
-                current_player.hand.append(self.board.draw())
-                print "\nYou drew", current_player.hand[-1]
-                if not current_player.get_moves():
-                    print "You have no available moves."
-                    raw_input("Press enter to continue.")
+                domino = current_player.draw()
+                moves = current_player.get_moves()
+                current_player.show_draw(domino, moves)
+                if not moves:
                     break
-                raw_input("Press enter to continue.")
             elif move == 'pass':
                 return
             else: